@@ -2,10 +2,7 @@
 """Centralized configuration for content generators"""
 
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
+from functools import lru_cache
 
 # Common settings
 PROJECT_NAME = "content-generator"
@@ -20,9 +17,14 @@ UGC_CONFIG = {
     "music_folder": "assets/music/instrumental_impact",
     "output_folder": "output/ugc",
     "tts_files_folder": "output/ugc/tts_files",
+    "text_cache_folder": "output/ugc/text_cache",  # Rendered hook text PNGs, reused across runs
+    "duration_cache_file": "output/ugc/cta_durations.json",  # Probed CTA durations, keyed on path/size/mtime
+    "normalize_sources": False,  # Pre-scale each hook/CTA video to 1080x1920 once and reuse it across outputs
+    "normalized_folder": "output/ugc/normalized",  # Where the normalized copies are kept
     "font": "assets/fonts/Lato-Black.ttf",
     "font_size": 70,
     "text_color": "white",
+    "text_glow_radius": 6,  # Blur radius of the soft shadow behind hook text (0 = hard outline)
     "background_color": "black",
     "num_videos": 3,
     "max_cta_videos": 1,
@@ -31,6 +33,17 @@ UGC_CONFIG = {
     "used_hooks_file": "content/used_hooks.txt",
     "video_list_file": "output/ugc/video_list.txt",
     "log_file": "output/ugc/video_creation.log",
+    # Rendering/encoding settings
+    "render_backend": "ffmpeg",  # Options: "ffmpeg" (one ffmpeg filter graph, no frames through Python) or "moviepy" (legacy)
+    "video_encoder": "auto",  # Options: "auto" (NVENC when ffmpeg supports it), "h264_nvenc" or "libx264"
+    "nvenc_preset": "p4",  # NVENC preset, p1 (fastest) to p7 (best quality)
+    "nvenc_bitrate": "8M",  # Target bitrate for NVENC encodes
+    "x264_preset": "veryfast",  # libx264 preset when NVENC isn't available ("medium" is ~3-5x slower)
+    "max_workers": 0,  # Videos rendered in parallel; 0 = auto (3 per GPU with NVENC, half the CPU cores otherwise)
+    "gpu_ids": [0],  # GPUs used for NVDEC/NVENC, videos are spread across them round-robin
+    "pin_worker_cpus": True,  # Pin each parallel worker to its own slice of CPU cores (Linux only)
+    "worker_nice": 5,  # Lower the priority of parallel workers so the desktop stays responsive (0 = off)
+    "tts_workers": 8,  # ElevenLabs voiceovers requested concurrently before/while rendering
     # Asset selection settings
     "file_selection_mode": "random",  # Options: "random" (default) or "sequential"
     "music_selection_mode": "sequential",  # Options: "random" or "sequential" - can be different from file_selection_mode
@@ -65,6 +78,8 @@ STORY_CONFIG = {
     "background_videos_folder": "assets/videos/backgrounds",
     "music_folder": "assets/music",
     "output_folder": "output/stories",
+    "stories_cache_file": "output/stories/stories_cache.json",  # Parsed stories.csv, reused while the CSV is unchanged
+    "background_cache_folder": "output/stories/backgrounds",  # Backgrounds pre-scaled/flipped/tinted by ffmpeg
     
     # Story selection settings
     "story_selection": "all",  # Options: "random" (default) or "all" for stories.csv
@@ -164,11 +179,22 @@ STORY_CONFIG = {
         "use_mov_container": True, # Use .mov container instead of .mp4
         "bitrate": "16000k"        # Video bitrate
     },
+    "video_encoder": "auto",  # "auto" = hardware encoder (NVENC/VideoToolbox/QSV) when ffmpeg has one, else the software codec; or an ffmpeg encoder name
+    "video_bitrate": "8M",  # Target bitrate for hardware encoders in standard mode (iPhone style uses its own bitrate)
 }
 
-# API credentials from environment variables
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
-FAL_KEY = os.getenv("FAL_KEY", "")
+# API credentials from environment variables, .env is only read once a key is needed
+@lru_cache(maxsize=1)
+def load_env():
+    """Load the .env file into the environment (once)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return True
+
+def get_env(name, default=""):
+    """Get an environment variable such as ELEVENLABS_API_KEY or FAL_KEY, loading .env first"""
+    load_env()
+    return os.getenv(name, default)
 
 # ElevenLabs configuration
 ELEVENLABS_CONFIG = {
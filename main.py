@@ -46,22 +46,21 @@ def main():
     
     # Import appropriate generator based on type
     if args.type == "ugc":
-        from scripts.ugc_generator import main as ugc_main
+        # Overrides must be applied before the generator is imported, since it
+        # reads settings like num_videos into module-level constants at import
+        from config import UGC_CONFIG
         logging.info("Starting UGC video generator")
         
         # Override NUM_VIDEOS if count is specified
         if args.count > 1:
-            from config import UGC_CONFIG
             UGC_CONFIG["num_videos"] = args.count
             
         # Override GENERATE_ALL_COMBINATIONS if --all is specified
         if args.all:
-            from config import UGC_CONFIG
             UGC_CONFIG["generate_all_combinations"] = True
             
         # Handle specific hook IDs if provided
         if args.id:
-            from config import UGC_CONFIG
             # Convert comma-separated string to list of integers
             try:
                 hook_ids = [int(id.strip()) for id in args.id.split(',')]
@@ -70,7 +69,8 @@ def main():
             except ValueError as e:
                 logging.error(f"Invalid hook ID format: {e}")
                 sys.exit(1)
-            
+        
+        from scripts.ugc_generator import main as ugc_main
         ugc_main()
         
     elif args.type == "story":
@@ -82,6 +82,7 @@ def main():
         story_main()
         
     elif args.type == "ai":
+        import asyncio
         from scripts.ai_generator import main as ai_main
         logging.info("Starting AI content generator")
         
@@ -103,7 +104,7 @@ def main():
         if args.type == "image" or args.type == "video":
             sys.argv.extend(["--type", args.type])
             
-        ai_main()
+        asyncio.run(ai_main())
         
     else:
         logging.error(f"Unknown generator type: {args.type}")
@@ -2,18 +2,18 @@
 # FalAIGenerator.py - Generate images and videos using Fal AI
 import os
 import csv
+import gc
 import json
 import time
+import asyncio
 import argparse
-import shutil
-import requests
-from pathlib import Path
+import httpx
+from pathlib import PurePosixPath
+from urllib.parse import urlparse
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import fal_client
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # ---- Configuration ----
 DEFAULT_IMAGE_MODEL = "fal-ai/flux/dev"
@@ -21,8 +21,62 @@ DEFAULT_VIDEO_MODEL = "fal-ai/minimax-video/image-to-video"
 DEFAULT_OUTPUT_DIR = "ai_generated"
 DEFAULT_CSV_FILE = "ai_prompts.csv"
 DEFAULT_BATCH_SIZE = 5  # Number of prompts to process in a batch before pausing
+DEFAULT_CONCURRENCY = 5  # Max number of Fal API requests in flight at once
+DEFAULT_RATE = 5.0  # Max Fal API requests started per second (0 = unlimited)
+THREAD_POOL_SIZE = 16  # Worker threads for blocking file writes
+DOWNLOAD_CHUNK_SIZE = 65536  # Bytes per chunk when streaming downloads to disk
+HTTP_RETRIES = 3  # Connection retries for file downloads
+KEEPALIVE_EXPIRY = 60  # Seconds to keep idle download connections open
+
+# Output filename templates
+MEDIA_FILENAME = "prompt{pid}_{ts}{suffix}{ext}"
+SUMMARY_FILENAME = "summary_{ts}.jsonl"
+
+# Shared limit on concurrent Fal API requests, created by main()
+_fal_semaphore = None
+
+# Limit on how fast new Fal API requests start, created by main()
+_rate_limiter = None
+
+# Single Fal async client reused for every request in the run, created by main()
+_fal_client = None
+
+# HTTP client and pending tasks for downloading generated files, created by main()
+_http_client = None
+_download_tasks = []
+
+# Generated image URLs for this run, keyed by (model, prompt, params).
+# Values are futures so concurrent prompts share one in-flight generation.
+_image_url_cache = {}
 
 # ---- Helper Functions ----
+class RateLimiter:
+    """Token bucket that limits how many requests start per second"""
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a request may start"""
+        if self.rate <= 0:
+            return
+        
+        async with self.lock:
+            while True:
+                # Refill the bucket for the time since the last request
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
 def setup_directories(base_dir):
     """Create output directories if they don't exist"""
     dirs = {
@@ -38,6 +92,10 @@ def setup_directories(base_dir):
 
 def validate_env():
     """Validate that required environment variables are set"""
+    # Load environment variables only when they're needed, not for --help
+    from dotenv import load_dotenv
+    load_dotenv()
+    
     fal_key = os.getenv("FAL_KEY")
     if not fal_key:
         print("Error: FAL_KEY not found in .env file")
@@ -46,6 +104,25 @@ def validate_env():
         return False
     return True
 
+def apply_image_defaults(params):
+    """Fill in default image parameters that aren't specified"""
+    if 'image_size' not in params and 'width' not in params and 'height' not in params:
+        # Use vertical 9:16 format (e.g., 576x1024)
+        params['width'] = 576
+        params['height'] = 1024
+    if 'num_images' not in params:
+        params['num_images'] = 2  # Generate 2 images by default
+    return params
+
+@dataclass(slots=True)
+class Prompt:
+    """A single row from the prompts CSV"""
+    id: str
+    type: str
+    prompt: str
+    model: str
+    params: dict = field(default_factory=dict)
+
 def load_prompts(csv_path):
     """Load prompts from CSV file"""
     if not os.path.exists(csv_path):
@@ -54,32 +131,63 @@ def load_prompts(csv_path):
     
     prompts = []
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            
+            # Resolve column positions once from the header
+            columns = {name: i for i, name in enumerate(header)}
+            required = {'id', 'type', 'prompt'}
+            if not required <= columns.keys():
+                print(f"Error: CSV header missing required columns: {', '.join(sorted(required - columns.keys()))}")
+                return []
+            
+            i_id = columns['id']
+            i_type = columns['type']
+            i_prompt = columns['prompt']
+            i_model = columns.get('model', -1)
+            i_params = columns.get('params', -1)
+            min_len = max(i_id, i_type, i_prompt) + 1
+            
+            def cell(row, i):
+                return row[i] if 0 <= i < len(row) else ''
+            
             for row in reader:
+                if not row:
+                    continue
+                
                 # Validate required fields
-                if 'id' not in row or 'type' not in row or 'prompt' not in row:
+                if len(row) < min_len:
                     print(f"Warning: Row missing required fields (id, type, prompt): {row}")
                     continue
                 
+                prompt_id = row[i_id]
+                prompt_type = row[i_type]
+                
                 # Parse params if they exist
-                if 'params' in row and row['params']:
+                params = {}
+                raw_params = cell(row, i_params)
+                if raw_params:
                     try:
-                        row['params'] = json.loads(row['params'])
+                        params = json.loads(raw_params)
                     except json.JSONDecodeError:
-                        print(f"Warning: Could not parse params JSON for row {row['id']}")
-                        row['params'] = {}
-                else:
-                    row['params'] = {}
+                        print(f"Warning: Could not parse params JSON for row {prompt_id}")
+                    if not isinstance(params, dict):
+                        print(f"Warning: params for row {prompt_id} must be a JSON object")
+                        params = {}
+                
+                if prompt_type == 'image':
+                    apply_image_defaults(params)
                 
                 # Set default model if not specified
-                if 'model' not in row or not row['model']:
-                    if row['type'] == 'image':
-                        row['model'] = DEFAULT_IMAGE_MODEL
-                    elif row['type'] == 'video':
-                        row['model'] = DEFAULT_VIDEO_MODEL
+                model = cell(row, i_model)
+                if not model:
+                    if prompt_type == 'image':
+                        model = DEFAULT_IMAGE_MODEL
+                    elif prompt_type == 'video':
+                        model = DEFAULT_VIDEO_MODEL
                 
-                prompts.append(row)
+                prompts.append(Prompt(prompt_id, prompt_type, row[i_prompt], model, params))
         
         print(f"Loaded {len(prompts)} prompts from {csv_path}")
         return prompts
@@ -89,333 +197,292 @@ def load_prompts(csv_path):
 
 def on_queue_update(update):
     """Callback for progress updates from Fal AI"""
-    if hasattr(update, 'logs') and update.logs:
-        for log in update.logs:
-            print(f"  Progress: {log['message']}")
+    logs = getattr(update, 'logs', None)
+    if logs:
+        # One write per update rather than one per log line
+        print('\n'.join(f"  Progress: {log['message']}" for log in logs))
 
-def save_image(result, prompt_data, output_dir, prompt_id):
-    """Save generated image(s) to output directory without individual JSON files"""
-    image_dir = os.path.join(output_dir, 'images')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    saved_files = []
-    
-    # Handle different result formats based on the model
-    if 'images' in result:
-        # Handle flux model format
-        for i, img_data in enumerate(result['images']):
-            if 'url' in img_data:
-                # Create filename with clear ID reference
-                ext = os.path.splitext(img_data['url'])[1] or '.png'
-                filename = f"prompt{prompt_id}_{timestamp}_{i}{ext}"
-                filepath = os.path.join(image_dir, filename)
-                
-                # Download the image from URL
-                try:
-                    response = requests.get(img_data['url'], stream=True)
-                    if response.status_code == 200:
-                        with open(filepath, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                f.write(chunk)
-                        print(f"  Downloaded image to: {filepath}")
-                    else:
-                        print(f"  Error downloading image: HTTP {response.status_code}")
-                except Exception as e:
-                    print(f"  Error downloading image: {e}")
-                
-                print(f"  Image available at: {img_data['url']}")
-                saved_files.append({
-                    'prompt_id': prompt_id,
-                    'type': 'image',
-                    'url': img_data['url'], 
-                    'local_path': filepath,
-                    'filename': os.path.basename(filepath),
-                    'prompt': prompt_data['prompt'],
-                    'model': prompt_data['model'],
-                    'params': prompt_data['params'],
-                    'generated_at': timestamp,
-                    'index': i
-                })
-    
-    elif 'image' in result and 'url' in result['image']:
-        # Handle single image result format
-        url = result['image']['url']
-        ext = os.path.splitext(url)[1] or '.png'
-        filename = f"prompt{prompt_id}_{timestamp}{ext}"
-        filepath = os.path.join(image_dir, filename)
-        
-        # Download the image from URL
-        try:
-            response = requests.get(url, stream=True)
+def _url_ext(url, default):
+    """Get the file extension from a URL, ignoring any query string"""
+    return PurePosixPath(urlparse(url).path).suffix or default
+
+async def _download_file(url, filepath, media_type):
+    """Stream a generated file from its URL to disk, returning whether it succeeded"""
+    try:
+        async with _http_client.stream('GET', url) as response:
             if response.status_code == 200:
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                print(f"  Downloaded image to: {filepath}")
-            else:
-                print(f"  Error downloading image: HTTP {response.status_code}")
-        except Exception as e:
-            print(f"  Error downloading image: {e}")
-        
-        print(f"  Image available at: {url}")
-        saved_files.append({
-            'prompt_id': prompt_id,
-            'type': 'image',
-            'url': url, 
-            'local_path': filepath,
-            'filename': os.path.basename(filepath),
-            'prompt': prompt_data['prompt'],
-            'model': prompt_data['model'],
-            'params': prompt_data['params'],
-            'generated_at': timestamp
-        })
-    
-    else:
-        print(f"  Warning: Unexpected result format: {result}")
-    
-    # Return list of saved files
-    return saved_files
+                # Disk I/O runs in worker threads so a large video doesn't stall
+                # the event loop (and the Fal requests and downloads on it)
+                f = await asyncio.to_thread(open, filepath, 'wb')
+                try:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+                print(f"  Downloaded {media_type} to: {filepath}")
+                return True
+            print(f"  Error downloading {media_type}: HTTP {response.status_code}")
+    except Exception as e:
+        print(f"  Error downloading {media_type}: {e}")
+    return False
+
+def _queue_download(url, filepath, media_type):
+    """Start a download in the background so the next Fal request isn't held up"""
+    task = asyncio.create_task(_download_file(url, filepath, media_type))
+    _download_tasks.append(task)
+    return task
 
-def save_video(result, prompt_data, output_dir, prompt_id):
-    """Save generated video(s) to output directory without individual JSON files"""
-    video_dir = os.path.join(output_dir, 'videos')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def _extract_urls(result):
+    """Get (index, url) pairs from a Fal result, whatever its shape
+    
+    Multi-file results ('images'/'videos') give an index per file; single-file
+    results ('image'/'video') give None.
+    """
+    for key in ('images', 'videos'):
+        if key in result:
+            return [(i, item['url']) for i, item in enumerate(result[key]) if 'url' in item]
+    for key in ('image', 'video'):
+        if key in result and 'url' in result[key]:
+            return [(None, result[key]['url'])]
+    return []
+
+def _save_files(result, prompt_data, prompt_id, media_dir, media_type, default_ext, timestamp=None):
+    """Queue downloads for every file in a Fal result and describe them"""
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    # Fields shared by every file from this generation
+    base = {
+        'prompt_id': prompt_id,
+        'type': media_type,
+        'prompt': prompt_data.prompt,
+        'model': prompt_data.model,
+        'params': prompt_data.params,
+        'generated_at': timestamp
+    }
     
-    saved_files = []
+    urls = _extract_urls(result)
+    if not urls:
+        print(f"  Warning: Unexpected result format for {media_type}: {result}")
     
-    # Handle different result formats based on the model
-    if 'video' in result and 'url' in result['video']:
-        # Handle video result
-        url = result['video']['url']
-        ext = os.path.splitext(url)[1] or '.mp4'
-        filename = f"prompt{prompt_id}_{timestamp}{ext}"
-        filepath = os.path.join(video_dir, filename)
+    saved_files = []
+    for i, url in urls:
+        # Create filename with clear ID reference
+        suffix = "" if i is None else f"_{i}"
+        filename = MEDIA_FILENAME.format(pid=prompt_id, ts=timestamp, suffix=suffix, ext=_url_ext(url, default_ext))
+        filepath = os.path.join(media_dir, filename)
         
-        # Download the video from URL
-        try:
-            response = requests.get(url, stream=True)
-            if response.status_code == 200:
-                with open(filepath, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                print(f"  Downloaded video to: {filepath}")
-            else:
-                print(f"  Error downloading video: HTTP {response.status_code}")
-        except Exception as e:
-            print(f"  Error downloading video: {e}")
+        # Download the file from URL
+        download_task = _queue_download(url, filepath, media_type)
         
-        print(f"  Video available at: {url}")
-        saved_files.append({
-            'prompt_id': prompt_id,
-            'type': 'video',
-            'url': url, 
+        print(f"  {media_type.capitalize()} available at: {url}")
+        file_data = {
+            **base,
+            'url': url,
             'local_path': filepath,
-            'filename': os.path.basename(filepath),
-            'prompt': prompt_data['prompt'],
-            'model': prompt_data['model'],
-            'params': prompt_data['params'],
-            'generated_at': timestamp
-        })
-    
-    elif 'videos' in result:
-        # Handle multiple videos result
-        for i, video_data in enumerate(result['videos']):
-            if 'url' in video_data:
-                ext = os.path.splitext(video_data['url'])[1] or '.mp4'
-                filename = f"prompt{prompt_id}_{timestamp}_{i}{ext}"
-                filepath = os.path.join(video_dir, filename)
-                
-                # Download the video from URL
-                try:
-                    response = requests.get(video_data['url'], stream=True)
-                    if response.status_code == 200:
-                        with open(filepath, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=8192):
-                                f.write(chunk)
-                        print(f"  Downloaded video to: {filepath}")
-                    else:
-                        print(f"  Error downloading video: HTTP {response.status_code}")
-                except Exception as e:
-                    print(f"  Error downloading video: {e}")
-                
-                print(f"  Video available at: {video_data['url']}")
-                saved_files.append({
-                    'prompt_id': prompt_id,
-                    'type': 'video',
-                    'url': video_data['url'], 
-                    'local_path': filepath,
-                    'filename': os.path.basename(filepath),
-                    'prompt': prompt_data['prompt'],
-                    'model': prompt_data['model'],
-                    'params': prompt_data['params'],
-                    'generated_at': timestamp,
-                    'index': i
-                })
-    
-    else:
-        print(f"  Warning: Unexpected result format for video: {result}")
+            'filename': filename,
+            'download_task': download_task
+        }
+        if i is not None:
+            file_data['index'] = i
+        saved_files.append(file_data)
     
     # Return list of saved files
     return saved_files
 
-def generate_image(prompt_data, output_dir):
+def save_image(result, prompt_data, image_dir, prompt_id, timestamp=None):
+    """Save generated image(s) to the images directory without individual JSON files"""
+    return _save_files(result, prompt_data, prompt_id, image_dir, 'image', '.png', timestamp)
+
+def save_video(result, prompt_data, video_dir, prompt_id, timestamp=None):
+    """Save generated video(s) to the videos directory without individual JSON files"""
+    return _save_files(result, prompt_data, prompt_id, video_dir, 'video', '.mp4', timestamp)
+
+async def subscribe(model, args):
+    """Submit a request to Fal AI, respecting the shared concurrency limit"""
+    async with _fal_semaphore:
+        await _rate_limiter.acquire()
+        result = await _fal_client.subscribe(
+            model,
+            arguments=args,
+            with_logs=True,
+            on_queue_update=on_queue_update
+        )
+        # Yield to the event loop before releasing the slot
+        await asyncio.sleep(0)
+        return result
+
+async def generate_image(prompt_data, image_dir, timestamp=None):
     """Generate image with Fal AI"""
-    prompt_id = prompt_data['id']
-    prompt_text = prompt_data['prompt']
-    model = prompt_data['model']
-    params = prompt_data['params']
+    prompt_id = prompt_data.id
+    prompt_text = prompt_data.prompt
+    model = prompt_data.model
+    params = prompt_data.params
     
     print(f"\nGenerating image for prompt #{prompt_id}:")
     print(f"  Prompt: {prompt_text}")
     print(f"  Model: {model}")
     
-    # Set up default parameters if not provided
-    if not params:
-        params = {}
-    
-    # Add default image parameters if not specified
-    if 'image_size' not in params and 'width' not in params and 'height' not in params:
-        # Use vertical 9:16 format (e.g., 576x1024)
-        params['width'] = 576
-        params['height'] = 1024
-    if 'num_images' not in params:
-        params['num_images'] = 2  # Generate 2 images by default
-    
-    # Add prompt to params
+    # Add prompt to params (image defaults were filled in by load_prompts)
     args = {"prompt": prompt_text, **params}
     
     try:
-        result = fal_client.subscribe(
-            model,
-            arguments=args,
-            with_logs=True,
-            on_queue_update=on_queue_update
-        )
+        result = await subscribe(model, args)
         
         # Save results
-        saved_files = save_image(result, prompt_data, output_dir, prompt_id)
+        saved_files = save_image(result, prompt_data, image_dir, prompt_id, timestamp)
+        if saved_files:
+            _cache_image_url(model, prompt_text, params, saved_files[0]['url'])
         return saved_files
     except Exception as e:
         print(f"  Error generating image: {str(e)}")
         return []
 
-def generate_video(prompt_data, output_dir):
-    """Generate video with Fal AI"""
-    prompt_id = prompt_data['id']
-    prompt_text = prompt_data['prompt']
-    model = prompt_data['model']
-    params = prompt_data['params']
+def _image_cache_key(model, prompt_text, params):
+    """Build a hashable cache key for an image request"""
+    return (model, prompt_text, json.dumps(params, sort_keys=True))
+
+def _cache_image_url(model, prompt_text, params, url):
+    """Remember an image URL so later source-image requests can reuse it"""
+    key = _image_cache_key(model, prompt_text, params)
+    if key not in _image_url_cache:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(url)
+        _image_url_cache[key] = future
+
+def needs_source_image(prompt_data):
+    """Check whether a video prompt needs an image generated before it can run"""
+    # For minimax-video model, we need an image or image_url
+    return (prompt_data.model == "fal-ai/minimax-video/image-to-video"
+            and 'image_url' not in (prompt_data.params or {}))
+
+async def _prepare_image_url(prompt_data, image_dir, timestamp=None):
+    """Generate the source image for a video prompt and return its URL"""
+    prompt_id = prompt_data.id
+    params = {
+        'width': 576,
+        'height': 1024,
+        'num_images': 1
+    }
     
-    print(f"\nGenerating video for prompt #{prompt_id}:")
-    print(f"  Prompt: {prompt_text}")
-    print(f"  Model: {model}")
+    # Reuse an image already generated (or being generated) for the same prompt
+    key = _image_cache_key(DEFAULT_IMAGE_MODEL, prompt_data.prompt, params)
+    if key in _image_url_cache:
+        print(f"  Reusing generated image for prompt #{prompt_id}")
+        return await _image_url_cache[key]
     
-    # Set up parameters
-    if not params:
-        params = {}
+    future = asyncio.get_running_loop().create_future()
+    _image_url_cache[key] = future
     
-    # For minimax-video model, we need an image or image_url
-    if model == "fal-ai/minimax-video/image-to-video":
-        if 'image_url' not in params:
-            # We need to generate an image first
-            print("  No image_url provided, generating image first using flux model...")
-            
-            # Create temporary image prompt data
-            image_prompt_data = {
-                'id': f"{prompt_id}_img",
-                'type': 'image',
-                'prompt': prompt_text,
-                'model': DEFAULT_IMAGE_MODEL,
-                'params': {
-                    'width': 576,
-                    'height': 1024,
-                    'num_images': 1
-                }
-            }
-            
-            # Generate the image
-            image_results = generate_image(image_prompt_data, output_dir)
-            
-            if image_results and 'url' in image_results[0]:
-                # Use the generated image URL for the video
-                params['image_url'] = image_results[0]['url']
-            else:
-                print("  Error: Failed to generate image for video")
-                return []
+    print(f"  No image_url provided for prompt #{prompt_id}, generating image first using flux model...")
+    
+    # Create temporary image prompt data
+    image_prompt_data = Prompt(
+        id=f"{prompt_id}_img",
+        type='image',
+        prompt=prompt_data.prompt,
+        model=DEFAULT_IMAGE_MODEL,
+        params=params
+    )
+    
+    # Generate the image
+    image_results = await generate_image(image_prompt_data, image_dir, timestamp)
+    
+    image_url = None
+    if image_results and 'url' in image_results[0]:
+        image_url = image_results[0]['url']
+    else:
+        # Don't cache failures so a later prompt can retry
+        del _image_url_cache[key]
+    future.set_result(image_url)
+    return image_url
+
+async def _submit_video(prompt_data, video_dir, timestamp=None):
+    """Submit a video request to Fal AI and save the results"""
+    prompt_id = prompt_data.id
+    model = prompt_data.model
     
     # Add prompt to params
-    args = {"prompt": prompt_text, **params}
+    args = {"prompt": prompt_data.prompt, **prompt_data.params}
     
     try:
-        result = fal_client.subscribe(
-            model,
-            arguments=args,
-            with_logs=True,
-            on_queue_update=on_queue_update
-        )
+        result = await subscribe(model, args)
         
         # Save results
-        saved_files = save_video(result, prompt_data, output_dir, prompt_id)
+        saved_files = save_video(result, prompt_data, video_dir, prompt_id, timestamp)
         return saved_files
     except Exception as e:
         print(f"  Error generating video: {str(e)}")
         return []
 
-def save_summary(results, output_dir):
-    """Save a detailed summary of generated content"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_dir = os.path.join(output_dir, 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    summary_path = os.path.join(log_dir, f"summary_{timestamp}.json")
-    
-    # Create a more detailed summary with all metadata
-    summary_data = {
-        'timestamp': timestamp,
-        'generated_at': datetime.now().isoformat(),
-        'prompt_count': len(results),
-        'file_count': sum(len(result['files']) for result in results),
-        'results': []
+async def generate_video(prompt_data, dirs, image_task=None, timestamp=None):
+    """Generate video with Fal AI
+    
+    If the prompt needs a source image, image_task may be an already-running
+    task from _prepare_image_url so the image is queued ahead of time.
+    """
+    prompt_id = prompt_data.id
+    
+    print(f"\nGenerating video for prompt #{prompt_id}:")
+    print(f"  Prompt: {prompt_data.prompt}")
+    print(f"  Model: {prompt_data.model}")
+    
+    # Set up parameters
+    if not prompt_data.params:
+        prompt_data.params = {}
+    
+    if needs_source_image(prompt_data):
+        if image_task is None:
+            image_task = _prepare_image_url(prompt_data, dirs['images'], timestamp)
+        image_url = await image_task
+        
+        if not image_url:
+            print("  Error: Failed to generate image for video")
+            return []
+        
+        # Use the generated image URL for the video
+        prompt_data.params['image_url'] = image_url
+    
+    return await _submit_video(prompt_data, dirs['videos'], timestamp)
+
+def open_summary(log_dir, timestamp=None):
+    """Open the run's summary file, written as one JSON line per prompt"""
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_path = os.path.join(log_dir, SUMMARY_FILENAME.format(ts=timestamp))
+    return summary_path, open(summary_path, 'w', encoding='utf-8')
+
+def _summary_record(prompt_data, files):
+    """Build the summary entry for a prompt and its files"""
+    record = {
+        'prompt_id': prompt_data.id,
+        'type': prompt_data.type,
+        'prompt': prompt_data.prompt,
+        'model': prompt_data.model,
+        'files': []
     }
     
-    # Add detailed information for each prompt and its files
-    for result in results:
-        prompt_data = {
-            'prompt_id': result['prompt_id'],
-            'type': result['type'],
-            'prompt': result['prompt'],
-            'model': result['model'],
-            'files': []
+    # Add detailed information for each file
+    for file in files:
+        file_data = {
+            'filename': file['filename'],
+            'type': file['type'],
+            'url': file['url'],
+            'model': file.get('model', record['model']),
+            'params': file.get('params', {}),
+            'generated_at': file['generated_at'],
+            'downloaded': file.get('downloaded', False)
         }
         
-        # Add detailed information for each file
-        for file in result['files']:
-            file_data = {
-                'filename': os.path.basename(file['local_path']),
-                'type': file['type'],
-                'url': file['url'],
-                'model': file.get('model', file.get('model', prompt_data['model'])),
-                'params': file.get('params', {}),
-                'generated_at': file['generated_at']
-            }
-            
-            # Add optional fields if they exist
-            if 'index' in file:
-                file_data['index'] = file['index']
-                
-            prompt_data['files'].append(file_data)
-            
-        summary_data['results'].append(prompt_data)
-    
-    # Write the summary file
-    with open(summary_path, 'w') as f:
-        json.dump(summary_data, f, indent=2)
+        # Add optional fields if they exist
+        if 'index' in file:
+            file_data['index'] = file['index']
+        
+        record['files'].append(file_data)
     
-    print(f"\nDetailed summary with all metadata saved to: {summary_path}")
-    return summary_path
+    return record
 
-def generate_csv_template(output_path):
+def generate_csv_template(output_path, force=False):
     """Generate a template CSV file with example prompts"""
-    if os.path.exists(output_path) and not args.force:
+    if not force and os.path.exists(output_path):
         print(f"File {output_path} already exists. Use --force to overwrite.")
         return False
     
@@ -430,34 +497,68 @@ def generate_csv_template(output_path):
     print("Edit this file to add your own prompts, then run the generator.")
     return True
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Generate images and videos using Fal AI")
+    parser.add_argument("--csv", default=DEFAULT_CSV_FILE, help="CSV file with prompts")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Output directory")
+    parser.add_argument("--type", choices=["all", "image", "video"], default="all", 
+                        help="Type of content to generate")
+    parser.add_argument("--id", help="Process only the prompt with this ID")
+    parser.add_argument("--batch", type=int, default=0, 
+                        help="Process a specific batch of prompts")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Number of prompts per batch")
+    parser.add_argument("--create-template", action="store_true",
+                        help="Create a template CSV file")
+    parser.add_argument("--force", action="store_true",
+                        help="Force overwrite existing files")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of concurrent Fal AI requests")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="Maximum Fal AI requests started per second (0 for no limit)")
+    
+    return parser.parse_args()
+
 # ---- Main Application ----
-def main():
+async def main(args=None):
     """Main function to process prompts and generate content"""
-    # Validate environment
-    if not validate_env():
-        return
+    if args is None:
+        args = parse_args()
     
-    # Create template if requested
+    # Create template if requested (needs no API key, so .env isn't loaded for it)
     if args.create_template:
-        generate_csv_template(args.csv)
+        generate_csv_template(args.csv, force=args.force)
+        return
+    
+    # Validate environment
+    if not validate_env():
         return
     
     # Set up directories
     dirs = setup_directories(args.output_dir)
     
-    # Load prompts
-    prompts = load_prompts(args.csv)
+    # Load prompts with the cyclic GC paused; the rows are plain data with no
+    # reference cycles, so collections during the bulk load are wasted work
+    gc.disable()
+    try:
+        prompts = load_prompts(args.csv)
+    finally:
+        gc.enable()
     if not prompts:
         return
     
+    # Move the loaded prompts out of the collector's view for the rest of the run
+    gc.freeze()
+    
     # Filter prompts by type if specified
     if args.type != 'all':
-        prompts = [p for p in prompts if p['type'] == args.type]
+        prompts = [p for p in prompts if p.type == args.type]
         print(f"Filtered to {len(prompts)} {args.type} prompts")
     
     # Filter prompts by ID if specified
     if args.id:
-        prompts = [p for p in prompts if p['id'] == args.id]
+        prompts = [p for p in prompts if p.id == args.id]
         print(f"Filtered to prompt with ID {args.id}")
     
     # Filter prompts by batch if specified
@@ -473,59 +574,95 @@ def main():
         print("No prompts to process after filtering. Exiting.")
         return
     
-    # Process prompts
-    results = []
-    for i, prompt in enumerate(prompts):
+    # Size the default executor used by asyncio.to_thread for file writes
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=max(THREAD_POOL_SIZE, args.concurrency * 2))
+    )
+    
+    # One timestamp for the whole run so filenames and the summary line up
+    run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    # Limit in-flight Fal API requests across image and video stages
+    global _fal_semaphore, _rate_limiter, _fal_client, _http_client
+    _fal_semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    _rate_limiter = RateLimiter(args.rate)
+    _fal_client = fal_client.AsyncClient()
+    _http_client = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            retries=HTTP_RETRIES,
+            limits=httpx.Limits(
+                max_keepalive_connections=max(1, args.concurrency),
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+        ),
+        timeout=60,
+        follow_redirects=True
+    )
+    
+    # Queue source images for video prompts up front so video requests can
+    # start as soon as their image is ready
+    image_tasks = {
+        i: asyncio.create_task(_prepare_image_url(p, dirs['images'], run_timestamp))
+        for i, p in enumerate(prompts)
+        if p.type == 'video' and needs_source_image(p)
+    }
+    
+    # Stream a summary line per finished prompt instead of holding every
+    # result in memory until the end of the run
+    summary_path, summary_file = open_summary(dirs['logs'], run_timestamp)
+    prompt_count = 0
+    file_count = 0
+    
+    async def process(i, prompt):
+        nonlocal prompt_count, file_count
         print(f"\n--- Processing prompt {i+1}/{len(prompts)} ---")
         
         try:
-            if prompt['type'] == 'image':
-                files = generate_image(prompt, args.output_dir)
-            elif prompt['type'] == 'video':
-                files = generate_video(prompt, args.output_dir)
+            if prompt.type == 'image':
+                files = await generate_image(prompt, dirs['images'], run_timestamp)
+            elif prompt.type == 'video':
+                files = await generate_video(prompt, dirs, image_tasks.get(i), run_timestamp)
             else:
-                print(f"Unsupported type: {prompt['type']}")
+                print(f"Unsupported type: {prompt.type}")
                 files = []
             
-            results.append({
-                'prompt_id': prompt['id'],
-                'type': prompt['type'],
-                'prompt': prompt['prompt'],
-                'model': prompt['model'],
-                'files': files
-            })
+            # Record the prompt once its own downloads are done, so each entry
+            # says whether its file actually made it to disk
+            downloaded = await asyncio.gather(*(file['download_task'] for file in files))
+            for file, ok in zip(files, downloaded):
+                file['downloaded'] = ok
             
-            # Small delay between prompts to avoid rate limiting
-            if i < len(prompts) - 1:
-                time.sleep(1)
+            # One short line, written on the loop so writes never interleave
+            record = _summary_record(prompt, files)
+            summary_file.write(json.dumps(record) + '\n')
+            summary_file.flush()
+            prompt_count += 1
+            file_count += len(files)
         
         except Exception as e:
-            print(f"Error processing prompt {prompt['id']}: {e}")
+            print(f"Error processing prompt {prompt.id}: {e}")
+    
+    tasks = [asyncio.create_task(process(i, p)) for i, p in enumerate(prompts)]
+    try:
+        await asyncio.gather(*tasks)
+        
+        # Wait for any downloads still in progress
+        await asyncio.gather(*_download_tasks)
+    finally:
+        await _http_client.aclose()
+        # Close the Fal client as well, on fal_client versions that keep a connection pool
+        close = getattr(_fal_client, 'aclose', None) or getattr(_fal_client, 'close', None)
+        if close is not None:
+            closed = close()
+            if asyncio.iscoroutine(closed):
+                await closed
+        summary_file.close()
     
-    # Save summary
-    save_summary(results, args.output_dir)
+    print(f"\nDetailed summary with all metadata saved to: {summary_path}")
     
     print("\nContent generation complete!")
-    print(f"Generated {len(results)} items")
+    print(f"Generated {prompt_count} items ({file_count} files)")
     print(f"Check {args.output_dir} for the generated content")
 
 if __name__ == "__main__":
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="Generate images and videos using Fal AI")
-    parser.add_argument("--csv", default=DEFAULT_CSV_FILE, help="CSV file with prompts")
-    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Output directory")
-    parser.add_argument("--type", choices=["all", "image", "video"], default="all", 
-                        help="Type of content to generate")
-    parser.add_argument("--id", help="Process only the prompt with this ID")
-    parser.add_argument("--batch", type=int, default=0, 
-                        help="Process a specific batch of prompts")
-    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
-                        help="Number of prompts per batch")
-    parser.add_argument("--create-template", action="store_true",
-                        help="Create a template CSV file")
-    parser.add_argument("--force", action="store_true",
-                        help="Force overwrite existing files")
-    
-    args = parser.parse_args()
-    
-    main() 
\ No newline at end of file
+    asyncio.run(main())
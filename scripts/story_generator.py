@@ -8,11 +8,12 @@ import sys
 import logging
 import random
 from datetime import datetime
-from moviepy.editor import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip, ColorClip, concatenate_videoclips
-from moviepy.video.fx import all as vfx
 import argparse
 import csv
 import re
+import json
+import hashlib
+import subprocess
 import numpy as np
 from functools import partial
 
@@ -20,11 +21,49 @@ from functools import partial
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import STORY_CONFIG, TARGET_RESOLUTION
-from scripts.utils import setup_directories, load_csv, resize_video, get_random_file, get_sequential_file, position_text_in_tiktok_safe_area, visualize_safe_area, hex_to_rgb
+from scripts.utils import setup_directories, load_csv_cached, resize_video, get_random_file, get_sequential_file, position_text_in_tiktok_safe_area, visualize_safe_area, hex_to_rgb, render_text_image, \
+    ffmpeg_has_encoder, list_media_files
 
 # Project name for filenames
 PROJECT_NAME = "StoryGen"
 
+# Whitespace after sentence-ending punctuation, where stories are split into sentences
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+# Filename parts: characters dropped from titles/themes/moods, whitespace in asset names
+FILENAME_SPECIAL_CHARS_RE = re.compile(r'[^\w\s-]')
+WHITESPACE_RE = re.compile(r'\s+')
+# Formatted once per run; story IDs keep the filenames of one run apart
+RUN_TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+VIDEO_ENCODER = STORY_CONFIG.get("video_encoder", "auto")
+VIDEO_BITRATE = STORY_CONFIG.get("video_bitrate", "8M")
+
+# Segmentation and text settings, read once instead of per segment
+MAX_CHARS_PER_SEGMENT = STORY_CONFIG.get("max_chars_per_segment", 200)
+MINIMUM_SEGMENT_LENGTH = STORY_CONFIG.get("minimum_segment_length", 0)
+USE_PARAGRAPHS_AS_SEGMENTS = STORY_CONFIG.get("use_paragraphs_as_segments", True)
+ONE_SENTENCE_PER_SEGMENT = STORY_CONFIG.get("one_sentence_per_segment", False)
+WORDS_PER_MINUTE = STORY_CONFIG.get("words_per_minute", 180)
+MIN_SEGMENT_DURATION = STORY_CONFIG.get("min_segment_duration", 3)
+MAX_SEGMENT_DURATION = STORY_CONFIG.get("max_segment_duration", 8)
+FADE_DURATION = STORY_CONFIG.get("fade_duration", 0.5)
+SEGMENT_POSITION_Y = STORY_CONFIG.get("segment_position_y", 800)
+TITLE_COLOR = STORY_CONFIG.get("title_color", STORY_CONFIG.get("text_color", "white"))
+TITLE_FONT = STORY_CONFIG.get("title_font", STORY_CONFIG.get("font"))
+HEADING_FONT_SIZE = STORY_CONFIG.get("heading_font_size", 72)
+BODY_COLOR = STORY_CONFIG.get("body_color", STORY_CONFIG.get("text_color", "white"))
+BODY_FONT = STORY_CONFIG.get("body_font", STORY_CONFIG.get("font"))
+BODY_FONT_SIZE = STORY_CONFIG.get("body_font_size", 58)
+
+# Hardware encoders tried in order when video_encoder is "auto", per codec family
+HW_ENCODERS = {
+    "h264": ["h264_nvenc", "h264_videotoolbox", "h264_qsv"],
+    "hevc": ["hevc_nvenc", "hevc_videotoolbox", "hevc_qsv"],
+}
+
+# Decoded background clips shared by the stories of one run, see load_background_clip
+_BACKGROUND_CLIPS = {}
+
 def has_story_been_generated(story_id, tracking_file):
     """Check if a story with given ID has already been generated"""
     if not os.path.exists(tracking_file) or os.path.getsize(tracking_file) == 0:
@@ -78,10 +117,10 @@ def segment_story(story_text, max_chars=None):
     2. Otherwise use one_sentence_per_segment or combined approach
     """
     if max_chars is None:
-        max_chars = STORY_CONFIG.get("max_chars_per_segment", 200)
+        max_chars = MAX_CHARS_PER_SEGMENT
     
     # Get minimum segment length setting
-    min_segment_length = STORY_CONFIG.get("minimum_segment_length", 0)
+    min_segment_length = MINIMUM_SEGMENT_LENGTH
     
     # Debug: Print a sample of the story text to see if it contains newlines
     sample_text = story_text[:100]  # First 100 chars
@@ -90,7 +129,7 @@ def segment_story(story_text, max_chars=None):
     logging.info("Debug - Contains newlines: %d", newline_count)
     
     # Check if paragraph-based segmentation is enabled
-    use_paragraphs = STORY_CONFIG.get("use_paragraphs_as_segments", True)
+    use_paragraphs = USE_PARAGRAPHS_AS_SEGMENTS
     
     segments = []
     
@@ -160,7 +199,7 @@ def segment_story(story_text, max_chars=None):
             else:
                 # Paragraph is too long, need further segmentation
                 # Use sentence or combined approach based on config
-                one_sentence_per_segment = STORY_CONFIG.get("one_sentence_per_segment", False)
+                one_sentence_per_segment = ONE_SENTENCE_PER_SEGMENT
                 if one_sentence_per_segment:
                     sub_segments = segment_by_sentences(paragraph, max_chars)
                 else:
@@ -175,7 +214,7 @@ def segment_story(story_text, max_chars=None):
             logging.info("Paragraph segmentation disabled, using regular segmentation")
             
         # Use standard segmentation approach
-        one_sentence_per_segment = STORY_CONFIG.get("one_sentence_per_segment", False)
+        one_sentence_per_segment = ONE_SENTENCE_PER_SEGMENT
         if one_sentence_per_segment:
             segments = segment_by_sentences(story_text, max_chars)
         else:
@@ -190,8 +229,7 @@ def segment_story(story_text, max_chars=None):
 
 def segment_by_sentences(text, max_chars):
     """Split text by sentences, respecting max characters"""
-    import re
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    sentences = SENTENCE_SPLIT_RE.split(text)
     result = []
     
     for sentence in sentences:
@@ -206,41 +244,49 @@ def segment_by_sentences(text, max_chars):
 
 def segment_by_chars(text, max_chars):
     """Split text by character count, trying to preserve words"""
-    words = text.split()
     result = []
-    current = ""
+    current = []
+    # Length of the words in current joined with spaces, so no test string is built per word
+    current_length = 0
     
-    for word in words:
-        test_word_addition = current + (" " if current else "") + word
+    for word in text.split():
+        added_length = len(word) + (1 if current else 0)
         
-        if len(test_word_addition) <= max_chars:
-            current = test_word_addition
+        if current_length + added_length <= max_chars:
+            current.append(word)
+            current_length += added_length
         else:
             if current:
-                result.append(current)
-            current = word
+                result.append(" ".join(current))
+            current = [word]
+            current_length = len(word)
     
     if current:
-        result.append(current)
+        result.append(" ".join(current))
     
     return result
 
 def calculate_segment_duration(segment, wpm=None):
     """Calculate appropriate duration based on word count and reading speed"""
     if wpm is None:
-        wpm = STORY_CONFIG.get("words_per_minute", 180)
+        wpm = WORDS_PER_MINUTE
     
     word_count = len(segment.split())
     duration = (word_count / wpm) * 60  # Convert to seconds
     
     # Apply min/max constraints
-    min_duration = STORY_CONFIG.get("min_segment_duration", 3)
-    max_duration = STORY_CONFIG.get("max_segment_duration", 8)
+    min_duration = MIN_SEGMENT_DURATION
+    max_duration = MAX_SEGMENT_DURATION
     
     return max(min_duration, min(duration, max_duration))
 
 def create_story_video(story_data, background_path, music_path, output_path):
     """Create a video with storytelling text overlaid on background"""
+    # moviepy is only imported when a video is actually rendered, not for --help or other generators
+    from moviepy.editor import AudioFileClip, CompositeVideoClip, ColorClip
+    from moviepy.video.fx import all as vfx
+    from moviepy.audio.fx import all as afx
+    
     logging.info(f"Creating story video: {story_data.get('title', 'Untitled')}")
     
     # Debug story data
@@ -255,17 +301,32 @@ def create_story_video(story_data, background_path, music_path, output_path):
             logging.info("Debug - Found literal \\n in story_text, replacing...")
             story_data['story_text'] = story_data['story_text'].replace('\\n', '\n')
     
-    # Load background video and resize
-    background = VideoFileClip(background_path)
-    background = resize_video(background, TARGET_RESOLUTION)
-    
     # Apply background effects from config
     background_effects = STORY_CONFIG.get("background_effects", {})
-    
-    # Apply flip effect to background if enabled
     flip_settings = background_effects.get("flip", {})
-    if flip_settings.get("enabled", False):
-        if flip_settings.get("horizontal", True):
+    mirror = flip_settings.get("enabled", False) and flip_settings.get("horizontal", True)
+    
+    # Static overlay colors are constant per pixel, so ffmpeg can bake them into the background
+    overlay_effects = STORY_CONFIG.get("overlay_effects", {})
+    gradient_settings = overlay_effects.get("gradient", {})
+    global_opacity = overlay_effects.get("global_opacity", 0.6)
+    if gradient_settings.get("enabled", False):
+        tint_color = None if gradient_settings.get("animation_enabled", False) else gradient_settings.get("start_color", "#3a1c71")
+    else:
+        tint_color = overlay_effects.get("solid_color", "#000000")
+    
+    # Load background video, scaled/cropped (and flipped/tinted) once by ffmpeg when possible
+    prepared_path = prepare_background(background_path, mirror, tint_color, global_opacity)
+    if prepared_path:
+        background = load_background_clip(prepared_path)
+        if mirror:
+            logging.info(f"Applied horizontal flip (mirror) effect to background with ffmpeg")
+    else:
+        tint_color = None
+        background = load_background_clip(background_path, resize=True)
+        
+        # Apply flip effect to background if enabled
+        if mirror:
             logging.info(f"Applying horizontal flip (mirror) effect to background")
             background = vfx.mirror_x(background)
     
@@ -322,9 +383,9 @@ def create_story_video(story_data, background_path, music_path, output_path):
         logging.info(f"Title width will be: {TARGET_RESOLUTION[0] - horizontal_margin}px (with {horizontal_margin}px margin)")
         
         # Get title-specific styling
-        title_color = STORY_CONFIG.get("title_color", STORY_CONFIG.get("text_color", "white"))
-        title_font = STORY_CONFIG.get("title_font", STORY_CONFIG.get("font"))
-        title_fontsize = STORY_CONFIG.get("heading_font_size", 72)
+        title_color = TITLE_COLOR
+        title_font = TITLE_FONT
+        title_fontsize = HEADING_FONT_SIZE
         title_stroke_width = text_effects.get("title_stroke_width", 2)
         title_stroke_color = text_effects.get("title_stroke_color", "#000000")
         
@@ -336,7 +397,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
             # Add better line spacing for title text (only needed for multi-line titles)
             if '\n' in story_data["title"]:
                 logging.info(f"Title contains multiple lines, adding increased line spacing")
-                # We can't directly control line height in TextClip, but we can add extra newlines
+                # The caption renderer has no line height option, but we can add extra newlines
                 # and recombine with proper spacing
                 title_lines = story_data["title"].split('\n')
                 # Add extra spacing by padding each line
@@ -358,21 +419,19 @@ def create_story_video(story_data, background_path, music_path, output_path):
             # Add better line spacing for title text (only needed for multi-line titles)
             if '\n' in story_data["title"]:
                 logging.info(f"Title contains multiple lines, adding increased line spacing")
-                # We can't directly control line height in TextClip, but we can add extra newlines
+                # The caption renderer has no line height option, but we can add extra newlines
                 # and recombine with proper spacing
                 title_lines = story_data["title"].split('\n')
                 # Add extra spacing by padding each line
                 story_data["title"] = '\n\n'.join(title_lines)
             
             # Create title clip without shadow effect
-            raw_title_clip = TextClip(
-                txt=story_data["title"],
+            raw_title_clip = create_text_clip(
+                text=story_data["title"],
                 fontsize=title_fontsize,
                 color=title_color,
                 font=title_font,
-                method='caption',
                 size=(TARGET_RESOLUTION[0] - horizontal_margin, None),
-                align='center',
                 stroke_color=title_stroke_color,
                 stroke_width=title_stroke_width
             ).set_duration(title_duration)
@@ -395,7 +454,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
             title_clip = raw_title_clip.set_position(("center", title_position_y))
         
         # Add fade in/out effects to title
-        fade_duration = STORY_CONFIG.get("fade_duration", 0.5)
+        fade_duration = FADE_DURATION
         title_clip = title_clip.crossfadein(fade_duration).crossfadeout(fade_duration)
     
     # Break story into segments
@@ -435,25 +494,18 @@ def create_story_video(story_data, background_path, music_path, output_path):
     
     # Create a looped background video if needed
     if total_video_duration > background.duration:
-        # Calculate how many loops we need
-        loops_needed = int(total_video_duration / background.duration) + 1
-        background_loops = [background] * loops_needed
-        looped_background = concatenate_videoclips(background_loops)
-        # Trim to exact duration needed
-        background = looped_background.subclip(0, total_video_duration)
+        # Wrap time around the clip instead of concatenating copies of it
+        background = vfx.loop(background, duration=total_video_duration)
     else:
         # If background is already long enough, just trim it to what we need
         background = background.subclip(0, total_video_duration)
     
     # Create overlay based on settings (solid color, gradient, or animated)
-    overlay_effects = STORY_CONFIG.get("overlay_effects", {})
-    gradient_settings = overlay_effects.get("gradient", {})
-    
-    # Get global opacity setting
-    global_opacity = overlay_effects.get("global_opacity", 0.6)
-    
-    # Create base overlay
-    if gradient_settings.get("enabled", False):
+    if tint_color is not None:
+        # Already blended into the prepared background
+        overlay = None
+        logging.info(f"Baked static color overlay {tint_color} into the background")
+    elif gradient_settings.get("enabled", False):
         # Use gradient overlay
         start_color = gradient_settings.get("start_color", "#3a1c71")
         end_color = gradient_settings.get("end_color", "#ff2956")  # Default end color if not specified
@@ -489,7 +541,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
         logging.info(f"Created solid color overlay with color {overlay_color}")
     
     # Combine background with overlay
-    base_clips = [background, overlay]
+    base_clips = [background] if overlay is None else [background, overlay]
     
     # Add noise effect if enabled
     noise_settings = overlay_effects.get("noise", {})
@@ -504,7 +556,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
         logging.info(f"Added noise effect with opacity {noise_opacity}")
     
     # Combine background with overlay(s)
-    base = CompositeVideoClip(base_clips)
+    base = CompositeVideoClip(base_clips) if len(base_clips) > 1 else background
     
     # Create clip for each segment
     segment_clips = []
@@ -515,19 +567,19 @@ def create_story_video(story_data, background_path, music_path, output_path):
         current_time = title_duration
     
     # Get body text styling
-    body_color = STORY_CONFIG.get("body_color", STORY_CONFIG.get("text_color", "white"))
-    body_font = STORY_CONFIG.get("body_font", STORY_CONFIG.get("font"))
-    body_fontsize = STORY_CONFIG.get("body_font_size", 58)  # Use the value from config
+    body_color = BODY_COLOR
+    body_font = BODY_FONT
+    body_fontsize = BODY_FONT_SIZE  # Use the value from config
     body_stroke_width = text_effects.get("body_stroke_width", 1)
     body_stroke_color = text_effects.get("body_stroke_color", "#000000")
     
     # Make sure title_fontsize is defined before using it
-    title_fontsize = STORY_CONFIG.get("heading_font_size", 72)  # Default title font size
+    title_fontsize = HEADING_FONT_SIZE  # Default title font size
     
     logging.info(f"Using title font size: {title_fontsize}pt, body font size: {body_fontsize}pt")
     
     # Process segments with proper positioning
-    fade_duration = STORY_CONFIG.get("fade_duration", 0.5)
+    fade_duration = FADE_DURATION
     
     for i, segment in enumerate(story_segments):
         segment_duration = segment_durations[i]
@@ -546,9 +598,9 @@ def create_story_video(story_data, background_path, music_path, output_path):
             logging.info(f"Content: '{content_text[:100]}...' [{len(content_text)} chars]")
             
             # Create title with title styling
-            title_color = STORY_CONFIG.get("title_color", STORY_CONFIG.get("text_color", "white"))
-            title_font = STORY_CONFIG.get("title_font", STORY_CONFIG.get("font"))
-            title_fontsize = STORY_CONFIG.get("heading_font_size", 72)
+            title_color = TITLE_COLOR
+            title_font = TITLE_FONT
+            title_fontsize = HEADING_FONT_SIZE
             title_stroke_width = text_effects.get("title_stroke_width", 2)
             title_stroke_color = text_effects.get("title_stroke_color", "#000000")
             
@@ -560,7 +612,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
                 # Add better line spacing for title text (only needed for multi-line titles)
                 if '\n' in title_text:
                     logging.info(f"Title contains multiple lines, adding increased line spacing")
-                    # We can't directly control line height in TextClip, but we can add extra newlines
+                    # The caption renderer has no line height option, but we can add extra newlines
                     # and recombine with proper spacing
                     title_lines = title_text.split('\n')
                     # Add extra spacing by padding each line
@@ -581,28 +633,26 @@ def create_story_video(story_data, background_path, music_path, output_path):
                 # Add better line spacing for title text (only needed for multi-line titles)
                 if '\n' in title_text:
                     logging.info(f"Title contains multiple lines, adding increased line spacing")
-                    # We can't directly control line height in TextClip, but we can add extra newlines
+                    # The caption renderer has no line height option, but we can add extra newlines
                     # and recombine with proper spacing
                     title_lines = title_text.split('\n')
                     # Add extra spacing by padding each line
                     title_text = '\n\n'.join(title_lines)
                 
-                title_text_clip = TextClip(
-                    txt=title_text,
+                title_text_clip = create_text_clip(
+                    text=title_text,
                     fontsize=title_fontsize,
                     color=title_color,
                     font=title_font,
-                    method='caption',
                     size=(TARGET_RESOLUTION[0] - horizontal_margin, None),
-                    align='center',
                     stroke_color=title_stroke_color,
                     stroke_width=title_stroke_width
                 )
                 
             # Create body text with body styling
-            body_color = STORY_CONFIG.get("body_color", STORY_CONFIG.get("text_color", "white"))
-            body_font = STORY_CONFIG.get("body_font", STORY_CONFIG.get("font"))
-            body_fontsize = STORY_CONFIG.get("body_font_size", 58)  # Use the value from config
+            body_color = BODY_COLOR
+            body_font = BODY_FONT
+            body_fontsize = BODY_FONT_SIZE  # Use the value from config
             body_stroke_width = text_effects.get("body_stroke_width", 1)
             
             # Create content text with shadow if enabled
@@ -622,14 +672,12 @@ def create_story_video(story_data, background_path, music_path, output_path):
                     stroke_color=body_stroke_color
                 )
             else:
-                content_text_clip = TextClip(
-                    txt=content_text,
+                content_text_clip = create_text_clip(
+                    text=content_text,
                     fontsize=body_fontsize,
                     color=body_color,
                     font=body_font,
-                    method='caption',
                     size=(TARGET_RESOLUTION[0] - horizontal_margin, None),
-                    align='center',
                     stroke_color=body_stroke_color,
                     stroke_width=body_stroke_width
                 )
@@ -692,14 +740,12 @@ def create_story_video(story_data, background_path, music_path, output_path):
                             stroke_color=body_stroke_color
                         )
                     else:
-                        content_text_clip = TextClip(
-                            txt=content_text,
+                        content_text_clip = create_text_clip(
+                            text=content_text,
                             fontsize=adjusted_fontsize,  # Reduced font size
                             color=body_color,
                             font=body_font,
-                            method='caption',
                             size=(TARGET_RESOLUTION[0] - horizontal_margin, None),
-                            align='center',
                             stroke_color=body_stroke_color,
                             stroke_width=body_stroke_width
                         )
@@ -756,7 +802,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
                 shadow_offset = text_effects.get("body_shadow_offset", 2)
                 
                 # Use the original font size from config without reduction
-                segment_fontsize = STORY_CONFIG.get("body_font_size", 58)
+                segment_fontsize = BODY_FONT_SIZE
                 body_stroke_color = text_effects.get("body_stroke_color", "#000000")
                 
                 # Create segment clip with shadow
@@ -773,18 +819,16 @@ def create_story_video(story_data, background_path, music_path, output_path):
                 ).set_duration(segment_duration)
             else:
                 # Use the original font size from config without reduction
-                segment_fontsize = STORY_CONFIG.get("body_font_size", 58)
+                segment_fontsize = BODY_FONT_SIZE
                 body_stroke_color = text_effects.get("body_stroke_color", "#000000")
                 
                 # Create segment clip without shadow effect
-                raw_segment_clip = TextClip(
-                    txt=segment,
+                raw_segment_clip = create_text_clip(
+                    text=segment,
                     fontsize=segment_fontsize,
                     color=body_color,
                     font=body_font,
-                    method='caption',
                     size=(TARGET_RESOLUTION[0] - horizontal_margin, None),
-                    align='center',
                     stroke_color=body_stroke_color,
                     stroke_width=body_stroke_width
                 ).set_duration(segment_duration)
@@ -802,7 +846,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
                 )
                 logging.info(f"Positioned segment {i+1} with TikTok safe margins at position factor: {segment_pos_factor}")
             else:
-                segment_position_y = STORY_CONFIG.get("segment_position_y", 800)
+                segment_position_y = SEGMENT_POSITION_Y
                 if segment_position_y is None:
                     segment_position_y = 800
                 segment_clip = raw_segment_clip.set_position(("center", segment_position_y))
@@ -832,9 +876,7 @@ def create_story_video(story_data, background_path, music_path, output_path):
     music = AudioFileClip(music_path)
     if music.duration < final_video.duration:
         # Loop music to match video duration
-        loops_needed = int(final_video.duration / music.duration) + 1
-        music_list = [music] * loops_needed
-        music = concatenate_audioclips(music_list)
+        music = afx.audio_loop(music, duration=final_video.duration)
     
     # Trim music to match video duration and set volume
     music = music.subclip(0, final_video.duration).volumex(0.3)
@@ -860,40 +902,37 @@ def create_story_video(story_data, background_path, music_path, output_path):
     # Write the final video with appropriate encoding based on configuration
     if iphone_style_enabled:
         logging.info("Writing video with iPhone-style encoding")
-        final_video.write_videofile(
-            output_path,
-            fps=24,
-            codec=iphone_style_config.get("codec", "libx265"),  # HEVC codec like iPhone
-            preset='medium',
-            bitrate=iphone_style_config.get("bitrate", "16000k"),
-            ffmpeg_params=[
-                '-tag:v', 'hvc1',         # Add HVC1 tag for Apple compatibility
-                '-pix_fmt', 'yuv420p',    # Standard pixel format
-                '-movflags', '+faststart', # Optimize for web streaming
-                '-color_primaries', 'bt709', # Standard color space
-                '-color_trc', 'bt709',     # Standard color transfer
-                '-colorspace', 'bt709',    # Standard colorspace
-            ],
-            audio_codec='aac',
-            audio_bitrate='192k',
-            threads=4
-        )
-        
-        # Apply iPhone metadata
-        from utils import apply_iphone_metadata
-        output_path = apply_iphone_metadata(output_path)
-        logging.info(f"Applied iPhone metadata to: {output_path}")
+        software_codec = iphone_style_config.get("codec", "libx265")  # HEVC codec like iPhone
+        bitrate = iphone_style_config.get("bitrate", "16000k")
+        ffmpeg_params = [
+            '-tag:v', 'hvc1',         # Add HVC1 tag for Apple compatibility
+            '-pix_fmt', 'yuv420p',    # Standard pixel format
+            '-movflags', '+faststart', # Optimize for web streaming
+            '-color_primaries', 'bt709', # Standard color space
+            '-color_trc', 'bt709',     # Standard color transfer
+            '-colorspace', 'bt709',    # Standard colorspace
+        ]
     else:
         # Standard encoding (original behavior)
         logging.info("Writing video with standard encoding")
-        final_video.write_videofile(
-            output_path,
-            fps=24,
-            codec="libx264",
-            audio_codec="aac",
-            audio_bitrate="192k",
-            threads=4
-        )
+        software_codec = "libx264"
+        bitrate = None
+        ffmpeg_params = []
+    
+    codec = get_story_encoder(software_codec)
+    try:
+        write_story_video(final_video, output_path, codec, bitrate, ffmpeg_params)
+    except (IOError, OSError) as e:
+        if codec == software_codec:
+            raise
+        logging.warning(f"Hardware encoder {codec} failed ({e}), retrying with {software_codec}")
+        write_story_video(final_video, output_path, software_codec, bitrate, ffmpeg_params)
+    
+    if iphone_style_enabled:
+        # Apply iPhone metadata
+        from scripts.utils import apply_iphone_metadata
+        output_path = apply_iphone_metadata(output_path)
+        logging.info(f"Applied iPhone metadata to: {output_path}")
     
     logging.info(f"Story video created: {output_path}")
     
@@ -925,6 +964,140 @@ def create_story_video(story_data, background_path, music_path, output_path):
             music_filename
         ])
 
+def get_story_encoder(software_codec="libx264"):
+    """
+    Pick the encoder for the final video. With video_encoder set to "auto", the
+    first hardware encoder ffmpeg was built with for the same codec family is
+    used, falling back to the software codec.
+    """
+    if VIDEO_ENCODER != "auto":
+        return VIDEO_ENCODER
+    family = "hevc" if software_codec in ("libx265", "hevc") else "h264"
+    for encoder in HW_ENCODERS[family]:
+        if ffmpeg_has_encoder(encoder):
+            return encoder
+    return software_codec
+
+def write_story_video(clip, output_path, codec, bitrate=None, ffmpeg_params=()):
+    """Write the final story clip, with rate control settings for hardware encoders."""
+    preset = 'medium'
+    params = list(ffmpeg_params)
+    if codec not in ("libx264", "libx265"):
+        # Hardware encoders default to a low bitrate, so always give them a target
+        bitrate = bitrate or VIDEO_BITRATE
+        if codec.endswith("_nvenc"):
+            # NVENC uses its own p1-p7 presets
+            preset = 'p4'
+            params = ['-rc', 'vbr'] + params
+    logging.info(f"Encoding with {codec}")
+    clip.write_videofile(
+        output_path,
+        fps=24,
+        codec=codec,
+        preset=preset,
+        bitrate=bitrate,
+        ffmpeg_params=params or None,
+        audio_codec='aac',
+        audio_bitrate='192k',
+        threads=4
+    )
+
+def select_asset_file(candidates, extensions, file_selection_mode, tracking_file=None):
+    """
+    Pick a file from the first candidate folder that has any matching files.
+    
+    Args:
+        candidates (list): (folder, sequential tracking category) pairs, in order of preference
+        extensions (list): File extensions to include
+        file_selection_mode (str): "random" or "sequential"
+        tracking_file (str): Sequential selection tracking file
+        
+    Returns:
+        str: Path to the selected file, or None if no folder has any
+    """
+    tried = set()
+    for directory, category in candidates:
+        # Folder listings are cached, so missing or empty folders cost no extra filesystem calls
+        if directory in tried or not list_media_files(directory, tuple(extensions)):
+            continue
+        tried.add(directory)
+        if file_selection_mode == "sequential":
+            path = get_sequential_file(directory, extensions, tracking_file, category)
+        else:  # Default to random
+            path = get_random_file(directory, extensions)
+        if path:
+            logging.info(f"Found {category.split(':')[0]} file in {directory}")
+            return path
+    return None
+
+def load_background_clip(path, resize=False):
+    """
+    Open a background video once per run and reuse the decoded clip for later
+    stories that pick the same file. Effects (loop, zoom, subclip) return new
+    clips, so the cached one is never modified.
+    """
+    key = (path, TARGET_RESOLUTION, resize)
+    clip = _BACKGROUND_CLIPS.get(key)
+    if clip is None:
+        from moviepy.editor import VideoFileClip
+        
+        clip = VideoFileClip(path)
+        if resize:
+            clip = resize_video(clip, TARGET_RESOLUTION)
+        _BACKGROUND_CLIPS[key] = clip
+    return clip
+
+def close_background_clips():
+    """Close the background clips opened by load_background_clip."""
+    for clip in _BACKGROUND_CLIPS.values():
+        clip.close()
+    _BACKGROUND_CLIPS.clear()
+
+def prepare_background(background_path, mirror=False, tint_color=None, tint_opacity=0):
+    """
+    Scale+crop a background video to the target resolution with ffmpeg, and
+    optionally mirror it and blend a solid tint color over it, so moviepy
+    doesn't resize, flip and alpha-blend every frame in Python.
+    
+    Results are cached in background_cache_folder, keyed on the source file
+    and settings, since backgrounds are reused across stories.
+    
+    Returns:
+        str: Path to the prepared video, or None if ffmpeg failed
+    """
+    width, height = TARGET_RESOLUTION
+    st = os.stat(background_path)
+    key = json.dumps([os.path.abspath(background_path), st.st_size, st.st_mtime_ns, width, height,
+                      mirror, tint_color, tint_opacity])
+    cache_folder = STORY_CONFIG.get("background_cache_folder", "output/stories/backgrounds")
+    prepared_path = os.path.join(cache_folder, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + ".mp4")
+    if os.path.exists(prepared_path):
+        return prepared_path
+    
+    filters = [f"scale={width}:{height}:force_original_aspect_ratio=increase", f"crop={width}:{height}", "setsar=1"]
+    if mirror:
+        filters.append("hflip")
+    if tint_color is not None:
+        filters.append(f"drawbox=x=0:y=0:w=iw:h=ih:color={tint_color}@{tint_opacity}:t=fill")
+    
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp_path = f"{prepared_path}.{os.getpid()}.tmp.mp4"
+    cmd = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', background_path,
+        '-vf', ','.join(filters), '-an',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p', tmp_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        os.replace(tmp_path, prepared_path)
+        logging.info(f"Prepared background {background_path} as {prepared_path}")
+        return prepared_path
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logging.warning(f"Could not prepare background with ffmpeg, processing it in moviepy: {e}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return None
+
 def create_descriptive_filename(story_data, background_path, music_path):
     """Create a descriptive filename that includes elements from the story, background, and music."""
     # Get story details
@@ -940,33 +1113,25 @@ def create_descriptive_filename(story_data, background_path, music_path):
     # Process title: keep first few words, convert to camelCase (if title exists)
     if title:
         # Clean up special characters
-        cleaned_title = re.sub(r'[^\w\s-]', '', title)
+        cleaned_title = FILENAME_SPECIAL_CHARS_RE.sub('', title)
         
-        # Split into words and limit to first few
-        words = cleaned_title.split()
-        selected_words = words[:5] if len(words) > 5 else words
+        # First five words only, without splitting the rest of the title
+        selected_words = cleaned_title.split(None, 5)[:5]
         
-        # Convert to camelCase
+        # Convert to camelCase: first word lowercase, the rest capitalized, joined without spaces
         if selected_words:
-            # First word lowercase
-            selected_words[0] = selected_words[0].lower()
-            # Rest with first letter capitalized
-            for i in range(1, len(selected_words)):
-                selected_words[i] = selected_words[i].capitalize() if selected_words[i] else ''
-            
-            # Join without spaces
-            title_summary = ''.join(selected_words)
+            title_summary = selected_words[0].lower() + ''.join(word.capitalize() for word in selected_words[1:])
         else:
             title_summary = 'untitled'
     else:
         title_summary = 'untitled'
     
     # Clean up names
-    background_name = re.sub(r'\s+', '_', background_name)[:20]  # Limit length
-    music_name = re.sub(r'\s+', '_', music_name)[:20]  # Limit length
+    background_name = WHITESPACE_RE.sub('_', background_name)[:20]  # Limit length
+    music_name = WHITESPACE_RE.sub('_', music_name)[:20]  # Limit length
     
     # Add date in format YYYYMMDD_HHMMSS
-    today = datetime.now().strftime("%Y%m%d_%H%M%S")
+    today = RUN_TIMESTAMP
     
     # Check if iPhone style is enabled and should use .mov extension
     iphone_style_config = STORY_CONFIG.get("iphone_style", {})
@@ -986,41 +1151,39 @@ def create_descriptive_filename(story_data, background_path, music_path):
     
     return filename
 
+def render_caption_image(text, fontsize, color, font, width, stroke_width=1, stroke_color="black",
+                         shadow_color=None, shadow_offset=0):
+    """
+    Render centered caption text to an RGBA array with PIL, optionally over a
+    drop shadow offset down and right, instead of ImageMagick via TextClip.
+    """
+    from PIL import Image
+    
+    text_image = render_text_image(text, font, fontsize, width, color=color, stroke_color=stroke_color,
+                                   stroke_width=stroke_width, glow_opacity=0)
+    if shadow_color is not None:
+        shadow = render_text_image(text, font, fontsize, width, color=shadow_color, stroke_color=stroke_color,
+                                   stroke_width=stroke_width, glow_opacity=0)
+        canvas = Image.new('RGBA', (text_image.width + shadow_offset, text_image.height + shadow_offset), (0, 0, 0, 0))
+        canvas.alpha_composite(shadow, (shadow_offset, shadow_offset))
+        canvas.alpha_composite(text_image)
+        text_image = canvas
+    return np.array(text_image)
+
+def create_text_clip(text, fontsize, color, font, size, stroke_color="black", stroke_width=1):
+    """Create a caption clip size[0] pixels wide, as tall as the wrapped text"""
+    from moviepy.editor import ImageClip
+    
+    return ImageClip(render_caption_image(text, fontsize, color, font, size[0], stroke_width, stroke_color))
+
 def create_text_with_shadow(text, fontsize, color, font, size, alignment='center', 
                            shadow_color="#000000", shadow_offset=2, stroke_width=1, stroke_color="black"):
     """Create text with shadow effect for better visibility"""
-    # Create the shadow text clip
-    shadow = TextClip(
-        txt=text,
-        fontsize=fontsize,
-        color=shadow_color,
-        font=font,
-        method='caption',
-        size=size,
-        align=alignment,
-        stroke_color=stroke_color,
-        stroke_width=stroke_width
-    )
+    from moviepy.editor import ImageClip
     
-    # Position the shadow slightly offset
-    shadow = shadow.set_position((shadow_offset, shadow_offset))
-    
-    # Create the main text clip
-    txt_clip = TextClip(
-        txt=text,
-        fontsize=fontsize,
-        color=color,
-        font=font,
-        method='caption',
-        size=size,
-        align=alignment,
-        stroke_color=stroke_color,
-        stroke_width=stroke_width
-    )
-    
-    # Combine shadow and text - don't specify size (let it be determined automatically)
-    final_text = CompositeVideoClip([shadow, txt_clip])
-    return final_text
+    # Shadow and text are drawn into one image, so there is no per-frame composite
+    return ImageClip(render_caption_image(text, fontsize, color, font, size[0], stroke_width, stroke_color,
+                                          shadow_color=shadow_color, shadow_offset=shadow_offset))
 
 def create_animated_gradient_overlay(duration, resolution, start_color, end_color, animation_speed=0.5, opacity=0.6):
     """Create an animated gradient overlay with a linear gradient that moves across the screen"""
@@ -1124,7 +1287,8 @@ def main():
         logging.info(f"Using {file_selection_mode} file selection mode")
     
     # Load stories data
-    stories = load_csv(STORY_CONFIG["stories_file"])
+    stories = load_csv_cached(STORY_CONFIG["stories_file"],
+                              STORY_CONFIG.get("stories_cache_file", "output/stories/stories_cache.json"))
     
     if not stories:
         logging.error(f"No stories found in {STORY_CONFIG['stories_file']}")
@@ -1228,7 +1392,7 @@ def main():
         theme = story.get("background_theme", "").lower()
         
         # Make theme directory-friendly by replacing spaces with underscores and removing special chars
-        theme_dir_name = re.sub(r'[^\w\s-]', '', theme).replace(' ', '_')
+        theme_dir_name = FILENAME_SPECIAL_CHARS_RE.sub('', theme).replace(' ', '_')
         
         # Original theme directory (for backward compatibility)
         original_theme_dir = os.path.join(STORY_CONFIG["background_videos_folder"], theme)
@@ -1240,109 +1404,17 @@ def main():
         logging.info(f"  - {original_theme_dir}")
         logging.info(f"  - {folder_friendly_theme_dir}")
         
-        # Get a background video based on file selection mode
-        background_path = None
-        
-        # First try the directory-friendly name
-        if os.path.exists(folder_friendly_theme_dir) and os.path.isdir(folder_friendly_theme_dir):
-            if file_selection_mode == "sequential":
-                background_path = get_sequential_file(
-                    folder_friendly_theme_dir, 
-                    ['.mp4', '.mov'], 
-                    sequential_tracking_file, 
-                    f"background:{theme_dir_name}"
-                )
-            else:  # Default to random
-                background_path = get_random_file(folder_friendly_theme_dir, ['.mp4', '.mov'])
-                
-            if background_path:
-                logging.info(f"Found background video in directory-friendly theme folder: {folder_friendly_theme_dir}")
-            else:
-                # Try the original theme name for backward compatibility
-                if os.path.exists(original_theme_dir) and os.path.isdir(original_theme_dir):
-                    if file_selection_mode == "sequential":
-                        background_path = get_sequential_file(
-                            original_theme_dir, 
-                            ['.mp4', '.mov'], 
-                            sequential_tracking_file, 
-                            f"background:{theme}"
-                        )
-                    else:  # Default to random
-                        background_path = get_random_file(original_theme_dir, ['.mp4', '.mov'])
-                        
-                    if background_path:
-                        logging.info(f"Found background video in original theme folder: {original_theme_dir}")
-                    else:
-                        # Fallback to main backgrounds directory
-                        if file_selection_mode == "sequential":
-                            background_path = get_sequential_file(
-                                STORY_CONFIG["background_videos_folder"], 
-                                ['.mp4', '.mov'], 
-                                sequential_tracking_file, 
-                                "background:main"
-                            )
-                        else:  # Default to random
-                            background_path = get_random_file(STORY_CONFIG["background_videos_folder"], ['.mp4', '.mov'])
-                            
-                        if background_path:
-                            logging.info(f"Fallback: Found background video in main backgrounds folder")
-                else:
-                    # Fallback to main backgrounds directory
-                    if file_selection_mode == "sequential":
-                        background_path = get_sequential_file(
-                            STORY_CONFIG["background_videos_folder"], 
-                            ['.mp4', '.mov'], 
-                            sequential_tracking_file, 
-                            "background:main"
-                        )
-                    else:  # Default to random
-                        background_path = get_random_file(STORY_CONFIG["background_videos_folder"], ['.mp4', '.mov'])
-                        
-                    if background_path:
-                        logging.info(f"Fallback: Found background video in main backgrounds folder")
-        else:
-            # Try the original theme name
-            if os.path.exists(original_theme_dir) and os.path.isdir(original_theme_dir):
-                if file_selection_mode == "sequential":
-                    background_path = get_sequential_file(
-                        original_theme_dir, 
-                        ['.mp4', '.mov'], 
-                        sequential_tracking_file, 
-                        f"background:{theme}"
-                    )
-                else:  # Default to random
-                    background_path = get_random_file(original_theme_dir, ['.mp4', '.mov'])
-                    
-                if background_path:
-                    logging.info(f"Found background video in original theme folder: {original_theme_dir}")
-                else:
-                    # Fallback to main backgrounds directory
-                    if file_selection_mode == "sequential":
-                        background_path = get_sequential_file(
-                            STORY_CONFIG["background_videos_folder"], 
-                            ['.mp4', '.mov'], 
-                            sequential_tracking_file, 
-                            "background:main"
-                        )
-                    else:  # Default to random
-                        background_path = get_random_file(STORY_CONFIG["background_videos_folder"], ['.mp4', '.mov'])
-                        
-                    if background_path:
-                        logging.info(f"Fallback: Found background video in main backgrounds folder")
-            else:
-                # Fallback to main backgrounds directory
-                if file_selection_mode == "sequential":
-                    background_path = get_sequential_file(
-                        STORY_CONFIG["background_videos_folder"], 
-                        ['.mp4', '.mov'], 
-                        sequential_tracking_file, 
-                        "background:main"
-                    )
-                else:  # Default to random
-                    background_path = get_random_file(STORY_CONFIG["background_videos_folder"], ['.mp4', '.mov'])
-                    
-                if background_path:
-                    logging.info(f"Fallback: Found background video in main backgrounds folder")
+        # Try the directory-friendly theme folder, then the original theme name, then the main folder
+        background_path = select_asset_file(
+            [
+                (folder_friendly_theme_dir, f"background:{theme_dir_name}"),
+                (original_theme_dir, f"background:{theme}"),
+                (STORY_CONFIG["background_videos_folder"], "background:main"),
+            ],
+            ['.mp4', '.mov'],
+            file_selection_mode,
+            sequential_tracking_file
+        )
         
         if not background_path:
             logging.error("No background videos found. Please add videos to the backgrounds directory.")
@@ -1352,7 +1424,7 @@ def main():
         mood = story.get("music_mood", "").lower()
         
         # Make mood directory-friendly by replacing spaces with underscores and removing special chars
-        mood_dir_name = re.sub(r'[^\w\s-]', '', mood).replace(' ', '_')
+        mood_dir_name = FILENAME_SPECIAL_CHARS_RE.sub('', mood).replace(' ', '_')
         
         # Original mood directory (for backward compatibility)
         original_mood_dir = os.path.join(STORY_CONFIG["music_folder"], mood)
@@ -1364,109 +1436,17 @@ def main():
         logging.info(f"  - {original_mood_dir}")
         logging.info(f"  - {folder_friendly_mood_dir}")
         
-        # Get music based on mood and file selection mode
-        music_path = None
-        
-        # First try the directory-friendly name
-        if os.path.exists(folder_friendly_mood_dir) and os.path.isdir(folder_friendly_mood_dir):
-            if file_selection_mode == "sequential":
-                music_path = get_sequential_file(
-                    folder_friendly_mood_dir, 
-                    ['.mp3', '.wav', '.m4a'], 
-                    sequential_tracking_file, 
-                    f"music:{mood_dir_name}"
-                )
-            else:  # Default to random
-                music_path = get_random_file(folder_friendly_mood_dir, ['.mp3', '.wav', '.m4a'])
-                
-            if music_path:
-                logging.info(f"Found music in directory-friendly mood folder: {folder_friendly_mood_dir}")
-            else:
-                # Try the original mood name for backward compatibility
-                if os.path.exists(original_mood_dir) and os.path.isdir(original_mood_dir):
-                    if file_selection_mode == "sequential":
-                        music_path = get_sequential_file(
-                            original_mood_dir, 
-                            ['.mp3', '.wav', '.m4a'], 
-                            sequential_tracking_file, 
-                            f"music:{mood}"
-                        )
-                    else:  # Default to random
-                        music_path = get_random_file(original_mood_dir, ['.mp3', '.wav', '.m4a'])
-                        
-                    if music_path:
-                        logging.info(f"Found music in original mood folder: {original_mood_dir}")
-                    else:
-                        # Fallback to main music directory
-                        if file_selection_mode == "sequential":
-                            music_path = get_sequential_file(
-                                STORY_CONFIG["music_folder"], 
-                                ['.mp3', '.wav', '.m4a'], 
-                                sequential_tracking_file, 
-                                "music:main"
-                            )
-                        else:  # Default to random
-                            music_path = get_random_file(STORY_CONFIG["music_folder"], ['.mp3', '.wav', '.m4a'])
-                            
-                        if music_path:
-                            logging.info(f"Fallback: Found music in main music folder")
-                else:
-                    # Fallback to main music directory
-                    if file_selection_mode == "sequential":
-                        music_path = get_sequential_file(
-                            STORY_CONFIG["music_folder"], 
-                            ['.mp3', '.wav', '.m4a'], 
-                            sequential_tracking_file, 
-                            "music:main"
-                        )
-                    else:  # Default to random
-                        music_path = get_random_file(STORY_CONFIG["music_folder"], ['.mp3', '.wav', '.m4a'])
-                        
-                    if music_path:
-                        logging.info(f"Fallback: Found music in main music folder")
-        else:
-            # Try the original mood name
-            if os.path.exists(original_mood_dir) and os.path.isdir(original_mood_dir):
-                if file_selection_mode == "sequential":
-                    music_path = get_sequential_file(
-                        original_mood_dir, 
-                        ['.mp3', '.wav', '.m4a'], 
-                        sequential_tracking_file, 
-                        f"music:{mood}"
-                    )
-                else:  # Default to random
-                    music_path = get_random_file(original_mood_dir, ['.mp3', '.wav', '.m4a'])
-                    
-                if music_path:
-                    logging.info(f"Found music in original mood folder: {original_mood_dir}")
-                else:
-                    # Fallback to main music directory
-                    if file_selection_mode == "sequential":
-                        music_path = get_sequential_file(
-                            STORY_CONFIG["music_folder"], 
-                            ['.mp3', '.wav', '.m4a'], 
-                            sequential_tracking_file, 
-                            "music:main"
-                        )
-                    else:  # Default to random
-                        music_path = get_random_file(STORY_CONFIG["music_folder"], ['.mp3', '.wav', '.m4a'])
-                        
-                    if music_path:
-                        logging.info(f"Fallback: Found music in main music folder")
-            else:
-                # Fallback to main music directory
-                if file_selection_mode == "sequential":
-                    music_path = get_sequential_file(
-                        STORY_CONFIG["music_folder"], 
-                        ['.mp3', '.wav', '.m4a'], 
-                        sequential_tracking_file, 
-                        "music:main"
-                    )
-                else:  # Default to random
-                    music_path = get_random_file(STORY_CONFIG["music_folder"], ['.mp3', '.wav', '.m4a'])
-                    
-                if music_path:
-                    logging.info(f"Fallback: Found music in main music folder")
+        # Try the directory-friendly mood folder, then the original mood name, then the main folder
+        music_path = select_asset_file(
+            [
+                (folder_friendly_mood_dir, f"music:{mood_dir_name}"),
+                (original_mood_dir, f"music:{mood}"),
+                (STORY_CONFIG["music_folder"], "music:main"),
+            ],
+            ['.mp3', '.wav', '.m4a'],
+            file_selection_mode,
+            sequential_tracking_file
+        )
         
         if not music_path:
             logging.error("No music files found. Please add music to the music directory.")
@@ -1482,6 +1462,8 @@ def main():
         create_story_video(story, background_path, music_path, output_path)
         
         print(f"✅ Story video created: {output_path}")
+    
+    close_background_clips()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,33 +1,30 @@
 import os
 import random
 import logging
-import pandas as pd
 import sys
-from moviepy.editor import (
-    VideoFileClip, TextClip, CompositeVideoClip, 
-    concatenate_videoclips, AudioFileClip, concatenate_audioclips,
-    CompositeAudioClip, ColorClip
-)
 import time
 from tqdm import tqdm
-import numpy as np
 import tempfile
 import subprocess
-from elevenlabs import generate, save, set_api_key, Voices
-from dotenv import load_dotenv
-from datetime import datetime
-import requests
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from elevenlabs import generate, save, set_api_key
 import json
+import csv
+import re
+import hashlib
+import itertools
 
 # Add the parent directory to the path to allow importing from the root
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# Load environment variables first
-load_dotenv()
-
 # Import the configuration
-from config import UGC_CONFIG, TARGET_RESOLUTION, ELEVENLABS_API_KEY, ELEVENLABS_CONFIG
-from scripts.utils import setup_directories, resize_video, get_random_file, position_text_in_tiktok_safe_area, visualize_safe_area
+from config import UGC_CONFIG, TARGET_RESOLUTION, ELEVENLABS_CONFIG, get_env
+from scripts.utils import (
+    setup_directories, resize_video, get_random_file, position_text_in_tiktok_safe_area, visualize_safe_area,
+    ffmpeg_has_encoder, ffmpeg_has_decoder, ffmpeg_has_filter, get_media_info, get_media_durations, get_cover_size, render_safe_area_image, render_text_image, get_safe_area_text_position
+)
 
 # Verify ffmpeg installation
 try:
@@ -54,12 +51,50 @@ MUSIC_FOLDER = UGC_CONFIG.get("music_folder", "assets/music")
 GENERATE_ALL_COMBINATIONS = UGC_CONFIG.get("generate_all_combinations", False)
 MAX_CTA_VIDEOS = UGC_CONFIG.get("max_cta_videos", 3)
 MAX_CTA_DURATION = UGC_CONFIG.get("max_cta_duration", 60)
+VIDEO_ENCODER = UGC_CONFIG.get("video_encoder", "auto")
+NVENC_PRESET = UGC_CONFIG.get("nvenc_preset", "p4")
+NVENC_BITRATE = UGC_CONFIG.get("nvenc_bitrate", "8M")
+X264_PRESET = UGC_CONFIG.get("x264_preset", "veryfast")
+RENDER_BACKEND = UGC_CONFIG.get("render_backend", "ffmpeg")
+MAX_WORKERS = UGC_CONFIG.get("max_workers", 0)
+GPU_IDS = UGC_CONFIG.get("gpu_ids", [0])
+PIN_WORKER_CPUS = UGC_CONFIG.get("pin_worker_cpus", True)
+TTS_WORKERS = UGC_CONFIG.get("tts_workers", 8)
+TRACKING_FLUSH_EVERY = 16  # Videos between flushes of video_list.txt/used_hooks.txt
+
+# Video numbers in video_list.txt: a 3-digit number after the date and project
+# name (YYYYMMDD_PROJECT_NAME_NUM_h...), or the old final_video_N.mp4 names
+VIDEO_NUMBER_RE = re.compile(r'_(\d{3})_h\d+_')
+OLD_VIDEO_NUMBER_RE = re.compile(r'final_video_(\d+)\.mp4')
+# Filename parts: characters dropped from hook text, whitespace in hook video names
+FILENAME_SPECIAL_CHARS_RE = re.compile(r'[^\w\s-]')
+WHITESPACE_RE = re.compile(r'\s+')
+# Formatted once, so all videos of a run share a date even past midnight
+RUN_DATE = time.strftime("%Y%m%d")
+WORKER_NICE = UGC_CONFIG.get("worker_nice", 5)
 
 # ElevenLabs configuration
 USE_ELEVENLABS = True  # Set to False to disable ElevenLabs TTS
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")  # API key from .env file
 SAVE_TTS_FILES = True  # Set to True to save raw TTS files for debugging
 TTS_FILES_FOLDER = UGC_CONFIG.get("tts_files_folder", "output/ugc/tts_files")
+FALLBACK_TTS_MODEL = "eleven_monolingual_v1"  # Previous working model, used when the default fails
+
+# Set once per process instead of on every TTS call
+_elevenlabs_key_set = False
+# Once the default model has failed, later calls go straight to the fallback model
+_tts_model = None
+# (path, size, mtime) of audio files that passed verify_audio_file
+_verified_audio_files = set()
+TEXT_CACHE_FOLDER = UGC_CONFIG.get("text_cache_folder", "output/ugc/text_cache")
+DURATION_CACHE_FILE = UGC_CONFIG.get("duration_cache_file", "output/ugc/cta_durations.json")
+NORMALIZE_SOURCES = UGC_CONFIG.get("normalize_sources", False)
+NORMALIZED_FOLDER = UGC_CONFIG.get("normalized_folder", "output/ugc/normalized")
+# Near-lossless, with a keyframe every second for clean cuts. Hook segments are encoded
+# with the same settings so they can be stream-copied next to normalized CTAs.
+NORMALIZED_VIDEO_ARGS = ['-c:v', 'libx264', '-preset', X264_PRESET, '-crf', '18', '-g', '24', '-pix_fmt', 'yuv420p']
+TEXT_GLOW_RADIUS = UGC_CONFIG.get("text_glow_radius", 6)
+VIDEO_EXTENSIONS = (".mp4", ".mov")
+MUSIC_EXTENSIONS = (".mp3", ".wav", ".m4a")
 
 # ---- SETUP LOGGING ----
 logging.basicConfig(
@@ -78,46 +113,61 @@ def setup_output_folder(folder_path):
     setup_directories([folder_path])
 
 def load_hooks(csv_path):
-    """Load hooks from a CSV file."""
+    """Load hooks from a CSV file as a list of row dicts (id, text and optional tts)."""
     if not os.path.exists(csv_path):
         logging.error(f"Hooks CSV file not found: {csv_path}")
         raise FileNotFoundError(f"Hooks CSV file not found: {csv_path}")
-    hooks = pd.read_csv(csv_path)
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        # Skip rows without hook text (blank trailing lines)
+        hooks = [row for row in csv.DictReader(f) if row.get("text")]
     logging.info(f"Loaded {len(hooks)} hooks from {csv_path}")
     return hooks
 
 def load_used_hooks(file_path):
     """Load the list of already used hooks from a file."""
     if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            used_hooks = set(f.read().splitlines())
+        # One bytes read and decode, no per-line text layer work
+        with open(file_path, "rb") as f:
+            used_hooks = set(f.read().decode("utf-8", errors="replace").splitlines())
             logging.info(f"Loaded {len(used_hooks)} used hooks.")
             return used_hooks
     else:
         logging.info("No used hooks file found. Starting fresh.")
         return set()
 
-def save_used_hook(file_path, hook_text):
-    """Save a used hook to the tracking file."""
-    with open(file_path, "a") as f:
-        f.write(hook_text + "\n")
+def save_used_hook(used_hooks_file, hook_text):
+    """Save a used hook to the open tracking file."""
+    used_hooks_file.write(hook_text + "\n")
     logging.info(f"Saved used hook: {hook_text}")
 
-def get_unused_hook(hooks, used_hooks):
-    """Get a random unused hook from the hooks list."""
-    unused_hooks = hooks[~hooks["text"].isin(used_hooks)]
-    if unused_hooks.empty:
-        logging.error("No unused hooks available! All hooks have been used.")
-        raise ValueError("No unused hooks available.")
-    selected_hook = unused_hooks.sample(1).iloc[0]["text"]
-    return selected_hook
+@lru_cache(maxsize=8)
+def list_media(folder_path, extensions):
+    """List the media files in a folder once per run (folders don't change mid-run)."""
+    # scandir gets the file type from the directory listing itself, no extra stat per file
+    with os.scandir(folder_path) as entries:
+        return tuple(sorted(
+            entry.name for entry in entries
+            if entry.name.lower().endswith(extensions) and entry.is_file()
+        ))
+
+def get_unused_hook_pool(hooks, used_hooks):
+    """Get the unused hooks as a shuffled list of (id, text) to pop from."""
+    pool = []
+    seen = set(used_hooks)
+    for hook in hooks:
+        hook_id, hook_text = hook["id"], hook["text"]
+        if hook_text not in seen:
+            seen.add(hook_text)
+            pool.append((hook_id, hook_text))
+    random.shuffle(pool)
+    return pool
 
 def get_random_video(folder_path):
     """Pick a random video file from a folder."""
     if not os.path.exists(folder_path):
         logging.error(f"Folder not found: {folder_path}")
         raise FileNotFoundError(f"Folder not found: {folder_path}")
-    video_files = [f for f in os.listdir(folder_path) if f.endswith((".mp4", ".mov"))]
+    video_files = list_media(folder_path, VIDEO_EXTENSIONS)
     if not video_files:
         logging.error(f"No video files found in {folder_path}")
         raise FileNotFoundError(f"No video files found in {folder_path}")
@@ -160,7 +210,7 @@ def get_all_videos(folder_path):
     if not os.path.exists(folder_path):
         logging.error(f"Folder not found: {folder_path}")
         raise FileNotFoundError(f"Folder not found: {folder_path}")
-    video_files = [f for f in os.listdir(folder_path) if f.endswith((".mp4", ".mov"))]
+    video_files = list_media(folder_path, VIDEO_EXTENSIONS)
     if not video_files:
         logging.error(f"No video files found in {folder_path}")
         raise FileNotFoundError(f"No video files found in {folder_path}")
@@ -185,14 +235,7 @@ def get_random_cta_videos(folder_path, max_count=MAX_CTA_VIDEOS, max_duration=MA
     total_duration = 0
     
     # First, calculate durations for each video
-    video_durations = {}
-    for video_path in all_cta_videos:
-        try:
-            with VideoFileClip(video_path) as clip:
-                video_durations[video_path] = clip.duration
-        except Exception as e:
-            logging.error(f"Error getting duration for {video_path}: {e}")
-            video_durations[video_path] = 0
+    video_durations = get_media_durations(all_cta_videos, cache_file=DURATION_CACHE_FILE)
     
     # Then select videos respecting both count and duration limits
     for video_path in all_cta_videos:
@@ -220,6 +263,7 @@ def get_sequential_cta_videos(folder_path, max_count=MAX_CTA_VIDEOS, max_duratio
     
     # Sort videos to ensure consistent ordering
     all_videos.sort()
+    video_durations = get_media_durations(all_videos, cache_file=DURATION_CACHE_FILE)
     
     # Calculate how many videos we need to check (might need to loop around)
     num_videos = len(all_videos)
@@ -245,19 +289,15 @@ def get_sequential_cta_videos(folder_path, max_count=MAX_CTA_VIDEOS, max_duratio
         video_path = all_videos[next_index]
         
         # Check duration
-        try:
-            with VideoFileClip(video_path) as clip:
-                duration = clip.duration
-                
-                # If it fits within our limits, add it
-                if total_duration + duration <= max_duration:
-                    selected_videos.append(video_path)
-                    total_duration += duration
-                    logging.info(f"Selected sequential CTA video {next_index+1}/{num_videos}: {os.path.basename(video_path)}")
-                else:
-                    logging.info(f"Skipping CTA video due to duration limit: {os.path.basename(video_path)}")
-        except Exception as e:
-            logging.error(f"Error checking duration for {video_path}: {e}")
+        duration = video_durations[video_path]
+        
+        # If it fits within our limits, add it
+        if total_duration + duration <= max_duration:
+            selected_videos.append(video_path)
+            total_duration += duration
+            logging.info(f"Selected sequential CTA video {next_index+1}/{num_videos}: {os.path.basename(video_path)}")
+        else:
+            logging.info(f"Skipping CTA video due to duration limit: {os.path.basename(video_path)}")
         
         # Update tracking
         current_index = next_index
@@ -285,7 +325,7 @@ def get_random_music(folder_path):
         logging.error(f"Music folder not found: {folder_path}")
         raise FileNotFoundError(f"Music folder not found: {folder_path}")
     
-    music_files = [f for f in os.listdir(folder_path) if f.endswith((".mp3", ".wav", ".m4a"))]
+    music_files = list_media(folder_path, MUSIC_EXTENSIONS)
     if not music_files:
         logging.error(f"No music files found in {folder_path}")
         raise FileNotFoundError(f"No music files found in {folder_path}")
@@ -324,7 +364,7 @@ def get_sequential_music(folder_path):
         raise FileNotFoundError(f"Music folder not found: {folder_path}")
     
     # Get all music files
-    music_files = [f for f in os.listdir(folder_path) if f.endswith((".mp3", ".wav", ".m4a"))]
+    music_files = list(list_media(folder_path, MUSIC_EXTENSIONS))
     if not music_files:
         logging.error(f"No music files found in {folder_path}")
         raise FileNotFoundError(f"No music files found in {folder_path}")
@@ -389,13 +429,23 @@ def get_sequential_music(folder_path):
         return get_random_music(folder_path)
 
 def verify_audio_file(file_path):
-    """Verify that an audio file contains valid audio data."""
+    """
+    Verify that an audio file contains valid audio data.
+    
+    Successful checks are remembered per (path, size, mtime), so files that are
+    checked again unchanged (music reused across videos) skip the ffprobe call.
+    """
     try:
+        st = os.stat(file_path)
+        cache_key = (file_path, st.st_size, st.st_mtime_ns)
+        if cache_key in _verified_audio_files:
+            return True
+        
         cmd = ['ffprobe', '-i', file_path, '-show_streams', '-select_streams', 'a', '-v', 'error']
         output = subprocess.check_output(cmd).decode('utf-8')
         if 'codec_type=audio' in output:
-            size = os.path.getsize(file_path)
-            logging.info(f"Audio file verified: {file_path} (size: {size} bytes)")
+            logging.info(f"Audio file verified: {file_path} (size: {st.st_size} bytes)")
+            _verified_audio_files.add(cache_key)
             return True
         else:
             logging.error(f"No audio stream found in file: {file_path}")
@@ -416,192 +466,366 @@ def check_video_has_audio(video_path):
         logging.error(f"Error checking audio in video {video_path}: {e}")
         return False
 
+def get_audio_duration(file_path):
+    """Get the duration of an audio file in seconds using ffprobe (uncached, the file may be rewritten)."""
+    return float(subprocess.check_output([
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', file_path
+    ]).decode().strip())
+
+def save_tts_audio(text, voice_id, output_path, model=None):
+    """Generate speech with ElevenLabs and write it to output_path."""
+    # Generate audio and get bytes
+    if model:
+        audio_bytes = generate(text=text, voice=voice_id, model=model)
+    else:
+        audio_bytes = generate(
+            text=text,
+            voice=voice_id  # Use voice ID string instead of voice object
+        )
+    
+    # Save the audio bytes directly to file
+    with open(output_path, 'wb') as f:
+        f.write(audio_bytes)
+    
+    # Verify file was created and has content
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        raise Exception(f"Failed to save audio file: {output_path}")
+
+def fit_tts_to_video(output_path, video_duration, fit_config):
+    """Speed up (or slow down) a TTS file in place so it fits the video duration."""
+    audio_duration = get_audio_duration(output_path)
+    logging.info(f"Generated audio duration: {audio_duration:.2f} seconds")
+    
+    max_speed = fit_config.get("max_speed_up", 2.0)
+    min_speed = fit_config.get("min_speed_down", 0.5)
+    preserve_pitch = fit_config.get("preserve_pitch", True)
+    
+    # Calculate required speed multiplier
+    speed = audio_duration / video_duration
+    
+    # Clamp speed to configured limits
+    speed = min(max(speed, min_speed), max_speed)
+    
+    if speed == 1.0:
+        return
+    
+    logging.info(f"Adjusting audio speed from {audio_duration:.2f}s to {video_duration:.2f}s (speed: {speed:.2f}x)")
+    
+    # Create temporary file for the adjusted audio
+    temp_output = output_path + ".temp.mp3"
+    
+    # Use ffmpeg to adjust audio speed
+    if preserve_pitch:
+        # Use atempo filter for speed adjustment while preserving pitch
+        audio_filter = f'atempo={speed}'
+    else:
+        # Use setpts filter for speed adjustment (changes pitch)
+        audio_filter = f'setpts={1/speed}*PTS'
+    cmd = ['ffmpeg', '-i', output_path, '-filter:a', audio_filter, '-y', temp_output]
+    
+    subprocess.run(cmd, check=True)
+    
+    # Replace original with adjusted version
+    os.replace(temp_output, output_path)
+    
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Adjusted audio duration: {get_audio_duration(output_path):.2f} seconds")
+
 def generate_elevenlabs_tts(text, output_path, video_duration=None):
     """Generate TTS audio using ElevenLabs API with improved error handling and best practices"""
-    if not ELEVENLABS_API_KEY:
-        raise ValueError("ELEVENLABS_API_KEY not found in environment variables")
-    
     # Set the API key
-    set_api_key(ELEVENLABS_API_KEY)
+    global _elevenlabs_key_set, _tts_model
+    if not _elevenlabs_key_set:
+        api_key = get_env("ELEVENLABS_API_KEY")  # API key from .env file
+        if not api_key:
+            raise ValueError("ELEVENLABS_API_KEY not found in environment variables")
+        set_api_key(api_key)
+        _elevenlabs_key_set = True
     
     # Get voice configuration
     voice_config = ELEVENLABS_CONFIG["voice"]
     audio_config = ELEVENLABS_CONFIG["audio"]
+    fit_config = audio_config.get("fit_to_video", {})
     
-    try:
-        # First try the direct voice ID approach
-        voice_id = voice_config["name"]
-        logging.info(f"Attempting to generate TTS with voice ID: {voice_id}")
-        
-        # Generate audio and get bytes
-        audio_bytes = generate(
-            text=text,
-            voice=voice_id  # Use voice ID string instead of voice object
-        )
-        
-        # Save the audio bytes directly to file
-        with open(output_path, 'wb') as f:
-            f.write(audio_bytes)
-        
-        # Verify file was created and has content
-        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            raise Exception(f"Failed to save audio file: {output_path}")
-        
-        # Get audio duration using ffprobe
-        audio_duration = float(subprocess.check_output([
-            'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1', output_path
-        ]).decode().strip())
-        
-        logging.info(f"Generated audio duration: {audio_duration:.2f} seconds")
-        
-        # If video duration is provided and audio fitting is enabled, adjust the speed
-        if video_duration and audio_config.get("fit_to_video", {}).get("enabled", False):
-            fit_config = audio_config["fit_to_video"]
-            max_speed = fit_config.get("max_speed_up", 2.0)
-            min_speed = fit_config.get("min_speed_down", 0.5)
-            preserve_pitch = fit_config.get("preserve_pitch", True)
-            
-            # Calculate required speed multiplier
-            speed = audio_duration / video_duration
-            
-            # Clamp speed to configured limits
-            speed = min(max(speed, min_speed), max_speed)
-            
-            if speed != 1.0:
-                logging.info(f"Adjusting audio speed from {audio_duration:.2f}s to {video_duration:.2f}s (speed: {speed:.2f}x)")
-                
-                # Create temporary file for the adjusted audio
-                temp_output = output_path + ".temp.mp3"
-                
-                # Use ffmpeg to adjust audio speed
-                if preserve_pitch:
-                    # Use atempo filter for speed adjustment while preserving pitch
-                    cmd = [
-                        'ffmpeg', '-i', output_path,
-                        '-filter:a', f'atempo={speed}',
-                        '-y', temp_output
-                    ]
-                else:
-                    # Use setpts filter for speed adjustment (changes pitch)
-                    cmd = [
-                        'ffmpeg', '-i', output_path,
-                        '-filter:a', f'setpts={1/speed}*PTS',
-                        '-y', temp_output
-                    ]
-                
-                subprocess.run(cmd, check=True)
-                
-                # Replace original with adjusted version
-                os.replace(temp_output, output_path)
-                
-                # Verify the new duration
-                new_duration = float(subprocess.check_output([
-                    'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                    '-of', 'default=noprint_wrappers=1:nokey=1', output_path
-                ]).decode().strip())
-                
-                logging.info(f"Adjusted audio duration: {new_duration:.2f} seconds")
-        
-        return output_path
-        
-    except Exception as e:
-        logging.error(f"Error generating TTS: {e}")
-        # Try fallback to previous working method
+    # First try the direct voice ID approach, then the previous working model
+    voice_id = voice_config["name"]
+    attempts = [_tts_model] if _tts_model else [None, FALLBACK_TTS_MODEL]
+    for model in attempts:
         try:
-            logging.info("Attempting fallback to previous working method")
-            # Generate audio bytes with fallback model
-            audio_bytes = generate(
-                text=text,
-                voice=voice_config["name"],
-                model="eleven_monolingual_v1"  # Use previous working model
-            )
+            if model == FALLBACK_TTS_MODEL and _tts_model is None:
+                logging.info("Attempting fallback to previous working method")
+            else:
+                logging.info(f"Attempting to generate TTS with voice ID: {voice_id}")
+            save_tts_audio(text, voice_id, output_path, model)
             
-            # Save the audio bytes directly to file
-            with open(output_path, 'wb') as f:
-                f.write(audio_bytes)
-                
-            return output_path
-        except Exception as fallback_error:
-            logging.error(f"Fallback method also failed: {fallback_error}")
-            raise
+            if model and _tts_model is None:
+                logging.info(f"Using {model} for the rest of this run")
+                _tts_model = model
+            break
+        except Exception as e:
+            logging.error(f"Error generating TTS with {model or 'the default model'}: {e}")
+            if model == attempts[-1]:
+                raise
+    
+    # If video duration is provided and audio fitting is enabled, adjust the speed
+    if video_duration and fit_config.get("enabled", False):
+        try:
+            fit_tts_to_video(output_path, video_duration, fit_config)
+        except Exception as e:
+            # The unadjusted voiceover is still usable
+            logging.error(f"Error fitting TTS to video duration: {e}")
+    
+    return output_path
 
-def resize_video(clip, target_resolution):
-    """Resize video to fill target resolution (may crop to fill)"""
+def load_fitted_clip(video_path, target_resolution=TARGET_RESOLUTION):
+    """
+    Load a video already scaled by ffmpeg to cover the target resolution, then
+    centre-crop it, so moviepy doesn't resize every frame in Python.
+    """
+    from moviepy.editor import VideoFileClip
+    
     target_w, target_h = target_resolution
-    clip_w, clip_h = clip.size
+    info = get_media_info(video_path)
+    if not info['width']:
+        return resize_video(VideoFileClip(video_path), target_resolution)
     
-    # Scale to fill
-    scale = max(target_w/clip_w, target_h/clip_h)
-    new_w = int(clip_w * scale)
-    new_h = int(clip_h * scale)
+    clip_w, clip_h = info['width'], info['height']
+    if abs(info['rotation']) in (90, 270):
+        # ffmpeg autorotates, so the decoded frames are the other way round
+        clip_w, clip_h = clip_h, clip_w
     
-    # First scale up
-    clip = clip.resize(width=new_w, height=new_h)
+    # Scale to fill, keeping both sides even and at least the target size
+    new_w, new_h = get_cover_size(clip_w, clip_h, target_w, target_h)
     
-    # Then crop to target size
-    x_center = new_w/2
-    y_center = new_h/2
-    x1 = int(x_center - target_w/2)
-    y1 = int(y_center - target_h/2)
+    # moviepy passes target_resolution (height, width) to ffmpeg's scale filter
+    clip = VideoFileClip(video_path, target_resolution=(new_h, new_w))
+    if (new_w, new_h) == (target_w, target_h):
+        return clip
+    x1 = (new_w - target_w) // 2
+    y1 = (new_h - target_h) // 2
     return clip.crop(x1=x1, y1=y1, width=target_w, height=target_h)
 
-def create_video(hook_video_path, hook_text, cta_video_paths, music_path, output_path):
-    """Create a single video by combining hook video, text, CTA videos, and music."""
+def loop_video_to_duration(video_path, duration):
+    """
+    Loop a video to `duration` seconds with ffmpeg by copying packets (no re-encode).
+    
+    Returns:
+        str: Path to a temporary video file, or None if ffmpeg failed
+    """
+    ext = os.path.splitext(video_path)[1] or '.mp4'
+    output_path = tempfile.NamedTemporaryFile(suffix=ext, delete=False).name
+    cmd = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-stream_loop', '-1', '-i', video_path,
+        '-t', f"{duration:.3f}", '-c', 'copy', output_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        return output_path
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logging.warning(f"Could not loop video with ffmpeg, looping in moviepy instead: {e}")
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        return None
+
+def fit_music_to_duration(music_path, duration):
+    """
+    Loop or trim a music file to exactly `duration` seconds with ffmpeg.
+    
+    Returns:
+        str: Path to a temporary WAV file, or None if ffmpeg failed
+    """
+    output_path = tempfile.NamedTemporaryFile(suffix='.wav', delete=False).name
+    cmd = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-stream_loop', '-1', '-i', music_path,
+        '-t', f"{duration:.3f}", '-vn', '-ac', '2', '-ar', '44100', output_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        return output_path
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logging.warning(f"Could not loop music with ffmpeg, looping in moviepy instead: {e}")
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        return None
+
+def rewrite_with_ffmpeg_audio(output_path, tts_file, music_path):
+    """
+    Replace the audio of a rendered video with the voiceover mixed over the
+    music (or just the music without a voiceover), copying the video stream.
+    
+    The fixed file is swapped in with os.replace, so a crash never leaves the
+    output missing.
+    """
+    logging.info(f"Attempting to fix audio with ffmpeg directly...")
+    cmd = ['ffmpeg', '-i', output_path]
+    if tts_file:
+        cmd += [
+            '-i', tts_file, '-i', music_path,
+            '-filter_complex', '[1:a]volume=1.5[a1];[2:a]volume=0.5[a2];[a1][a2]amix=inputs=2:duration=longest[a]',
+            '-map', '0:v', '-map', '[a]'
+        ]
+    else:
+        cmd += ['-i', music_path, '-map', '0:v', '-map', '1:a']
+    # Same folder as the output so the replace stays on one filesystem
+    temp_output = os.path.join(os.path.dirname(output_path), f"temp_{os.path.basename(output_path)}")
+    cmd += ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k', '-y', temp_output]
+    subprocess.check_call(cmd)
+    if os.path.exists(temp_output) and verify_audio_file(temp_output):
+        os.replace(temp_output, output_path)
+        logging.info(f"Successfully fixed audio using ffmpeg directly: {output_path}")
+    elif os.path.exists(temp_output):
+        os.unlink(temp_output)
+
+def get_tts_texts(hooks):
+    """Map each hook text to its TTS-specific text from the hooks CSV 'tts' column."""
+    return {
+        hook['text']: hook['tts'] for hook in hooks
+        if (hook.get('tts') or '').strip()
+    }
+
+def get_tts_file_path(tts_text, hook_duration):
+    """Get the TTS_FILES_FOLDER path of the voiceover for a text fitted to a hook length."""
+    voice_config = ELEVENLABS_CONFIG["voice"]
+    audio_config = ELEVENLABS_CONFIG["audio"]
+    key = json.dumps([tts_text, voice_config["name"], audio_config.get("fit_to_video", {}), round(hook_duration, 2)],
+                     sort_keys=True)
+    return os.path.join(TTS_FILES_FOLDER, f"tts_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.mp3")
+
+def generate_hook_tts(hook_text, hook_video_path, tts_text=None):
+    """
+    Generate the hook voiceover with ElevenLabs, fitted to the hook video.
+    
+    tts_text is the hook's TTS-specific text, resolved up front by main() so
+    workers don't have to re-read the hooks CSV; the hook text is used without it.
+    
+    Returns:
+        str: Path to the verified TTS audio file, or None if TTS is disabled or failed
+    """
+    if not USE_ELEVENLABS:
+        return None
+    
+    if tts_text:
+        logging.info(f"Using TTS-specific text: {tts_text}")
+    else:
+        logging.info(f"No TTS-specific text found, using original hook text")
+        tts_text = hook_text
+    
+    # Get hook video duration for TTS adjustment
+    hook_duration = get_media_info(hook_video_path)['duration']
+    logging.info(f"Hook video duration: {hook_duration:.2f} seconds")
+    
+    # Same text, voice and hook length always gives the same file, so re-runs reuse it
+    tts_file = get_tts_file_path(tts_text, hook_duration)
+    if os.path.exists(tts_file) and os.path.getsize(tts_file) > 0 and verify_audio_file(tts_file):
+        logging.info(f"Reusing TTS file: {tts_file}")
+        return tts_file
+    
+    print("Generating TTS with ElevenLabs...")
+    os.makedirs(TTS_FILES_FOLDER, exist_ok=True)
+    # A unique temp file per call: TTS runs on threads that share one pid
+    fd, tmp_path = tempfile.mkstemp(dir=TTS_FILES_FOLDER, suffix=".tmp.mp3")
+    os.close(fd)
+    try:
+        if generate_elevenlabs_tts(tts_text, tmp_path, video_duration=hook_duration):
+            # Verify audio file before using it
+            if verify_audio_file(tmp_path):
+                os.replace(tmp_path, tts_file)
+                return tts_file
+            logging.error("Failed to verify TTS audio file, skipping TTS")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return None
+
+def get_video_encoder():
+    """Get the video encoder to use, preferring NVENC when set to auto."""
+    if VIDEO_ENCODER == "auto":
+        return "h264_nvenc" if ffmpeg_has_encoder("h264_nvenc") else "libx264"
+    return VIDEO_ENCODER
+
+def get_encoder_settings(codec=None, gpu_id=0):
+    """Get write_videofile codec settings for the given (or configured) encoder."""
+    codec = codec or get_video_encoder()
+    if codec == "h264_nvenc":
+        # NVENC uses its own p1-p7 presets and rate control options
+        return {
+            "codec": codec,
+            "preset": NVENC_PRESET,
+            "ffmpeg_params": [
+                "-rc", "vbr", "-b:v", NVENC_BITRATE, "-profile:v", "high", "-pix_fmt", "yuv420p",
+                "-gpu", str(gpu_id)
+            ],
+        }
+    # CPU fallback: a fast preset with one encoder thread per core
+    return {
+        "codec": codec,
+        "preset": X264_PRESET,
+        "ffmpeg_params": ["-threads", "0", "-pix_fmt", "yuv420p"],
+    }
+
+def create_video(hook_video_path, hook_text, cta_video_paths, music_path, output_path, gpu_id=0, tts_text=None,
+                 tts_file=None, generate_tts=True):
+    """
+    Create a single video by combining hook video, text, CTA videos, and music.
+    
+    Pass an already generated voiceover as tts_file with generate_tts=False to
+    skip the ElevenLabs call here.
+    """
+    if generate_tts and tts_file is None:
+        tts_file = generate_hook_tts(hook_text, hook_video_path, tts_text)
+    
+    if RENDER_BACKEND == "ffmpeg":
+        return create_video_ffmpeg(hook_video_path, hook_text, cta_video_paths, music_path, output_path, gpu_id, tts_file)
+    return create_video_moviepy(hook_video_path, hook_text, cta_video_paths, music_path, output_path, gpu_id, tts_file)
+
+def create_video_moviepy(hook_video_path, hook_text, cta_video_paths, music_path, output_path, gpu_id=0, tts_file=None):
+    """Render a video with moviepy (frames are composited in Python)."""
+    # moviepy/numpy are only imported for this backend, the ffmpeg one doesn't need them
+    import numpy as np
+    from moviepy.editor import (
+        CompositeVideoClip, ImageClip, concatenate_videoclips, AudioFileClip, concatenate_audioclips, CompositeAudioClip
+    )
+    
+    # Every clip holds an ffmpeg reader process, so they are closed in `finally`
+    # even when rendering fails
+    tts_audio = None
+    hook_clip = None
+    cta_clips = []
+    background_music = None
+    fitted_music_path = None
+    looped_hook_path = None
+    final_video = None
     try:
         print(f"\nProcessing video with hook: {hook_text}")
         
-        # Generate TTS if enabled
-        tts_audio = None
-        tts_file = None
-        if USE_ELEVENLABS:
-            print("Generating TTS with ElevenLabs...")
-            tts_file = tempfile.NamedTemporaryFile(suffix='.mp3', delete=False).name
-            logging.info(f"Temporary TTS file path: {tts_file}")
-            
-            # Get the tts value from the hooks dataframe if available
-            tts_text = hook_text
+        if tts_file:
             try:
-                # Find the hook in the hooks dataframe by text
-                hooks_df = load_hooks(HOOKS_CSV)
-                hook_row = hooks_df[hooks_df['text'] == hook_text]
-                
-                if not hook_row.empty and 'tts' in hook_row.columns and hook_row['tts'].iloc[0]:
-                    tts_text = hook_row['tts'].iloc[0]
-                    logging.info(f"Using TTS-specific text: {tts_text}")
-                else:
-                    logging.info(f"No TTS-specific text found, using original hook text")
+                tts_audio = AudioFileClip(tts_file)
+                logging.info(f"Loaded TTS audio with duration: {tts_audio.duration:.2f} seconds")
             except Exception as e:
-                logging.warning(f"Error finding TTS text: {e}. Using original hook text.")
-            
-            # Get hook video duration for TTS adjustment
-            with VideoFileClip(hook_video_path) as hook_clip:
-                hook_duration = hook_clip.duration
-                logging.info(f"Hook video duration: {hook_duration:.2f} seconds")
-            
-            if generate_elevenlabs_tts(tts_text, tts_file, video_duration=hook_duration):
-                try:
-                    # Verify audio file before loading
-                    if verify_audio_file(tts_file):
-                        tts_audio = AudioFileClip(tts_file)
-                        logging.info(f"Loaded TTS audio with duration: {tts_audio.duration:.2f} seconds")
-                    else:
-                        logging.error("Failed to verify TTS audio file, skipping TTS")
-                        tts_audio = None
-                except Exception as e:
-                    logging.error(f"Error loading TTS audio file: {e}")
-                    tts_audio = None
+                logging.error(f"Error loading TTS audio file: {e}")
+                tts_audio = None
         
         print("Loading hook video...")
-        hook_clip = VideoFileClip(hook_video_path)
-        hook_clip = resize_video(hook_clip, TARGET_RESOLUTION)
-        logging.info(f"Hook video duration: {hook_clip.duration:.2f} seconds")
+        hook_duration = get_media_info(hook_video_path)['duration']
+        logging.info(f"Hook video duration: {hook_duration:.2f} seconds")
         
         # If TTS is enabled and successfully generated, make sure hook clip is long enough
-        if tts_audio and tts_audio.duration > hook_clip.duration:
+        if tts_audio and tts_audio.duration > hook_duration:
             # Loop the clip to match the TTS duration
-            logging.info(f"Extending hook video from {hook_clip.duration:.2f}s to {tts_audio.duration:.2f}s to match TTS")
-            hook_clip = hook_clip.loop(duration=tts_audio.duration)
+            logging.info(f"Extending hook video from {hook_duration:.2f}s to {tts_audio.duration:.2f}s to match TTS")
+            looped_hook_path = loop_video_to_duration(hook_video_path, tts_audio.duration)
+        
+        if looped_hook_path:
+            hook_clip = load_fitted_clip(looped_hook_path)
+            hook_clip = hook_clip.subclip(0, min(hook_clip.duration, tts_audio.duration))
+        else:
+            hook_clip = load_fitted_clip(hook_video_path)
+            if tts_audio and tts_audio.duration > hook_clip.duration:
+                hook_clip = hook_clip.loop(duration=tts_audio.duration)
 
         print("Adding text overlay...")
         # Get TikTok margin settings if enabled
@@ -618,79 +842,30 @@ def create_video(hook_video_path, hook_text, cta_video_paths, music_path, output
         text_width = hook_clip.w - horizontal_margin
         logging.info(f"Text width will be {text_width}px (with {horizontal_margin}px margin)")
         
-        # Set up text clip parameters
-        # Create main text clip with improved smoothness
-        text_clip_args = {
-            "txt": hook_text,
-            "fontsize": FONT_SIZE,
-            "color": TEXT_COLOR,
-            "font": FONT,
-            "method": 'caption',
-            "size": (text_width, None),
-            "align": 'center',
-            "stroke_color": 'black',
-            "stroke_width": 2,  # Keep this for main text
-            "kerning": -1,
-            "interline": -1,
-        }
-        
-        # Reduced glow effect
-        glow_layers = 1  # Reduced from 2 to 1 layers
+        # Text is static for the whole hook, so render it once with PIL
+        text_image = np.array(render_hook_text(hook_text, text_width))
+        text_clip = ImageClip(text_image, transparent=True).set_duration(hook_clip.duration)
         
         # Get appropriate Y position for text with TikTok safe areas
         if use_tiktok_margins:
             # Use our custom text positioning utility for consistent text placement
             # Set position to 33% of safe area for primary hook text
             main_text = position_text_in_tiktok_safe_area(
-                TextClip(**text_clip_args),
+                text_clip,
                 tiktok_margins,
                 TARGET_RESOLUTION,
                 position_factor=0.33  # Position text 1/3 into the safe area
-            ).set_duration(hook_clip.duration)
-            
-            # Apply the same positioning to glow effects for consistency
-            glow_clips = []
-            for i in range(glow_layers):
-                glow_args = {**text_clip_args, 
-                           "color": "black",
-                           "stroke_width": 2 + i,
-                           "stroke_color": "black"}
-                
-                glow = position_text_in_tiktok_safe_area(
-                    TextClip(**glow_args),
-                    tiktok_margins,
-                    TARGET_RESOLUTION,
-                    position_factor=0.33  # Match main text position
-                ).set_duration(hook_clip.duration).set_opacity(0.2)
-                
-                glow_clips.append(glow)
-            
+            )
             logging.info(f"Positioned hook text with TikTok safe margins at position factor: 0.33")
         else:
             # Default positioning when not using TikTok margins
             text_y_position = 350  # Default position
             logging.info(f"Using standard text position: {text_y_position}px")
-            
-            # Create glow layers
-            glow_clips = []
-            for i in range(glow_layers):
-                glow = (TextClip(**{**text_clip_args, 
-                                "color": "black",
-                                "stroke_width": 2 + i,
-                                "stroke_color": "black"})
-                       .set_duration(hook_clip.duration)
-                       .set_position(("center", text_y_position))
-                       .set_opacity(0.2))
-                glow_clips.append(glow)
-                
-            # Main text on top
-            main_text = (TextClip(**text_clip_args)
-                        .set_duration(hook_clip.duration)
-                        .set_position(("center", text_y_position)))
+            main_text = text_clip.set_position(("center", text_y_position))
 
         # Combine hook video with text overlay
         print("Combining hook and text...")
-        combined_hook = CompositeVideoClip([hook_clip] + glow_clips + [main_text])
+        combined_hook = CompositeVideoClip([hook_clip, main_text])
         
         # Handle audio separately to ensure TTS is preserved
         hook_with_tts = None
@@ -730,15 +905,13 @@ def create_video(hook_video_path, hook_text, cta_video_paths, music_path, output
 
         # Load CTA videos
         print("Loading CTA videos...")
-        cta_clips = []
         for cta_path in cta_video_paths:
             # First check if the video has audio using ffprobe
             has_audio = check_video_has_audio(cta_path)
             if not has_audio:
                 logging.warning(f"CTA video has no audio track: {cta_path}")
             
-            cta_clip = VideoFileClip(cta_path)
-            cta_clip = resize_video(cta_clip, TARGET_RESOLUTION)
+            cta_clip = load_fitted_clip(cta_path)
             
             # Double check the audio with MoviePy
             if cta_clip.audio is None:
@@ -759,16 +932,17 @@ def create_video(hook_video_path, hook_text, cta_video_paths, music_path, output
             
         # Add background music
         print("Adding background music...")
-        background_music = AudioFileClip(music_path)
+        # ffmpeg loops/trims the music to the video duration in one pass
+        fitted_music_path = fit_music_to_duration(music_path, final_video.duration)
+        background_music = AudioFileClip(fitted_music_path or music_path)
         
-        # Loop or trim music to match video duration
-        if background_music.duration < final_video.duration:
+        if not fitted_music_path and background_music.duration < final_video.duration:
             # Loop music if it's shorter than video
             n_loops = int(np.ceil(final_video.duration / background_music.duration))
             background_music = concatenate_audioclips([background_music] * n_loops)
         
         # Trim music to video duration and set volume
-        background_music = background_music.subclip(0, final_video.duration).volumex(0.3)
+        background_music = background_music.subclip(0, min(background_music.duration, final_video.duration)).volumex(0.3)
         
         # Create final audio track by compositing all audio sources
         if hook_with_tts:
@@ -881,151 +1055,472 @@ def create_video(hook_video_path, hook_text, cta_video_paths, music_path, output
         print(f"Writing final video to {output_path}...")
         
         # Specify audio codec and bitrate explicitly to ensure audio is properly encoded
+        encoder_settings = get_encoder_settings(gpu_id=gpu_id)
+        logging.info(f"Encoding with {encoder_settings['codec']}")
         try:
-            final_video.write_videofile(
-                output_path, 
-                fps=24, 
-                codec="libx264",
-                audio_codec="aac",  # Specify a more compatible audio codec
-                audio_bitrate="192k",  # Higher audio bitrate for better quality
-                preset='medium',
-                verbose=False,
-                logger=None
-            )
+            try:
+                final_video.write_videofile(
+                    output_path, 
+                    fps=24, 
+                    audio_codec="aac",  # Specify a more compatible audio codec
+                    audio_bitrate="192k",  # Higher audio bitrate for better quality
+                    verbose=False,
+                    logger=None,
+                    **encoder_settings
+                )
+            except Exception as e:
+                if encoder_settings["codec"] == "libx264":
+                    raise
+                # Hardware encoder missing or out of sessions, retry on the CPU
+                logging.warning(f"{encoder_settings['codec']} encode failed ({e}), retrying with libx264")
+                final_video.write_videofile(
+                    output_path, 
+                    fps=24, 
+                    audio_codec="aac",
+                    audio_bitrate="192k",
+                    verbose=False,
+                    logger=None,
+                    **get_encoder_settings("libx264")
+                )
+            # write_videofile either wrote the AAC track or raised, so there is nothing to verify here
             logging.info(f"Successfully wrote video file with audio: {output_path}")
-            
-            # Verify the final video has audio
-            if not verify_audio_file(output_path):
-                logging.error(f"Final video does not contain audio: {output_path}")
-                # Try to fix the video with ffmpeg directly
-                try:
-                    temp_output = f"temp_{os.path.basename(output_path)}"
-                    if hook_with_tts:
-                        logging.info(f"Attempting to fix audio with ffmpeg directly...")
-                        # Create a version with audio using ffmpeg directly
-                        cmd = [
-                            'ffmpeg', '-i', output_path, '-i', tts_file, '-i', music_path,
-                            '-filter_complex', '[1:a]volume=1.5[a1];[2:a]volume=0.5[a2];[a1][a2]amix=inputs=2:duration=longest[a]',
-                            '-map', '0:v', '-map', '[a]', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k',
-                            '-y', temp_output
-                        ]
-                        subprocess.check_call(cmd)
-                        if os.path.exists(temp_output) and verify_audio_file(temp_output):
-                            # Replace the original with the fixed version
-                            os.remove(output_path)
-                            os.rename(temp_output, output_path)
-                            logging.info(f"Successfully fixed audio using ffmpeg directly: {output_path}")
-                    else:
-                        # For no-TTS case, we might need to extract and preserve CTA audio
-                        logging.info(f"Attempting to fix audio (preserving CTA audio) with ffmpeg directly...")
-                        
-                        # Check if there are CTA videos with audio that we need to consider
-                        has_cta_audio = any(verify_audio_file(cta_path) for cta_path in cta_video_paths)
-                        
-                        if has_cta_audio:
-                            # This is more complex as we'd need to extract CTA audio and position it correctly
-                            # Since this requires knowledge of the CTA start times and durations, 
-                            # we'll just log that manual ffmpeg work would be needed
-                            logging.info("CTA audio detected but direct ffmpeg fix is limited. Apply the moviepy fix instead.")
-                            # Just add background music as fallback
-                            cmd = [
-                                'ffmpeg', '-i', output_path, '-i', music_path,
-                                '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k',
-                                '-y', temp_output
-                            ]
-                            subprocess.check_call(cmd)
-                            if os.path.exists(temp_output) and verify_audio_file(temp_output):
-                                # Replace the original with the fixed version
-                                os.remove(output_path)
-                                os.rename(temp_output, output_path)
-                                logging.info(f"Added background music as fallback: {output_path}")
-                        else:
-                            # Just add background music
-                            cmd = [
-                                'ffmpeg', '-i', output_path, '-i', music_path,
-                                '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k',
-                                '-y', temp_output
-                            ]
-                            subprocess.check_call(cmd)
-                            if os.path.exists(temp_output) and verify_audio_file(temp_output):
-                                # Replace the original with the fixed version
-                                os.remove(output_path)
-                                os.rename(temp_output, output_path)
-                                logging.info(f"Successfully fixed audio using ffmpeg directly: {output_path}")
-                except Exception as e:
-                    logging.error(f"Error fixing audio with ffmpeg: {e}")
         except Exception as e:
             logging.error(f"Error writing video file: {e}")
             # Try to fall back to writing with default settings
             try:
                 logging.info("Falling back to default write_videofile settings")
-                final_video.write_videofile(output_path, verbose=False, logger=None)
+                # Still keep the fast preset and all cores, moviepy's defaults are "medium" on one thread
+                final_video.write_videofile(output_path, preset=X264_PRESET, threads=os.cpu_count(), verbose=False, logger=None)
             except Exception as e2:
                 logging.error(f"Fallback write also failed: {e2}")
                 raise
+            
+            # The default settings don't pin the audio codec, so check the fallback output has audio
+            if not verify_audio_file(output_path):
+                logging.error(f"Final video does not contain audio: {output_path}")
+                # Try to fix the video with ffmpeg directly
+                try:
+                    if not hook_with_tts and any(verify_audio_file(cta_path) for cta_path in cta_video_paths):
+                        # Positioning CTA audio would need the CTA start times, so only music is added back
+                        logging.info("CTA audio detected but direct ffmpeg fix is limited. Apply the moviepy fix instead.")
+                    rewrite_with_ffmpeg_audio(output_path, tts_file if hook_with_tts else None, music_path)
+                except Exception as e:
+                    logging.error(f"Error fixing audio with ffmpeg: {e}")
+        
+        logging.info(f"Created video: {output_path} at resolution {TARGET_RESOLUTION}")
+        print(f"✅ Video created successfully: {output_path}")
         
+    except Exception as e:
+        logging.error(f"Error creating video: {e}")
+        print(f"❌ Error creating video: {e}")
+        raise
+    finally:
         # Clean up
-        hook_clip.close()
-        for clip in cta_clips:
-            clip.close()
-        background_music.close()
-        final_video.close()
+        for clip in [final_video, hook_clip, *cta_clips, background_music, tts_audio]:
+            if clip is not None:
+                try:
+                    clip.close()
+                except Exception as e:
+                    logging.warning(f"Error closing clip: {e}")
+        for path in (fitted_music_path, looped_hook_path):
+            if path and os.path.exists(path):
+                os.unlink(path)
         
         # Clean up temp TTS file if it exists
-        if tts_audio:
-            tts_audio.close()
-            if tts_file and os.path.exists(tts_file) and not SAVE_TTS_FILES:
+        if tts_file and os.path.exists(tts_file):
+            if not SAVE_TTS_FILES:
                 os.unlink(tts_file)
                 logging.info(f"Cleaned up temporary TTS file: {tts_file}")
-            elif SAVE_TTS_FILES:
+            else:
                 logging.info(f"Kept temporary TTS file for debugging: {tts_file}")
+
+def get_text_cache_path(hook_text, text_width):
+    """Get the TEXT_CACHE_FOLDER path of the PNG render of a hook text."""
+    key = json.dumps([hook_text, FONT, FONT_SIZE, TEXT_COLOR, TEXT_GLOW_RADIUS, text_width])
+    return os.path.join(TEXT_CACHE_FOLDER, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".png")
+
+@lru_cache(maxsize=256)
+def render_hook_text(hook_text, text_width):
+    """
+    Render hook text with its stroke and glow once per unique text and width.
+    
+    Renders are also kept as PNGs in TEXT_CACHE_FOLDER so re-runs and other
+    worker processes can skip the rendering. Images are padded to even sides
+    so ffmpeg can overlay the cached PNG as is in yuv420p.
+    """
+    from PIL import Image
+    
+    cache_path = get_text_cache_path(hook_text, text_width)
+    if os.path.exists(cache_path):
+        try:
+            with Image.open(cache_path) as cached:
+                return cached.convert('RGBA')
+        except OSError as e:
+            logging.warning(f"Ignoring unreadable text cache file {cache_path}: {e}")
+    
+    text_image = render_text_image(hook_text, FONT, FONT_SIZE, text_width, color=TEXT_COLOR, glow_radius=TEXT_GLOW_RADIUS)
+    width, height = text_image.width + (text_image.width & 1), text_image.height + (text_image.height & 1)
+    if (width, height) != text_image.size:
+        padded = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        padded.paste(text_image, (0, 0))
+        text_image = padded
+    
+    try:
+        os.makedirs(TEXT_CACHE_FOLDER, exist_ok=True)
+        # Write to a temp name first so parallel workers never read a partial file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        text_image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not cache rendered text: {e}")
+    return text_image
+
+def render_hook_overlay(hook_text):
+    """
+    Get a transparent PNG of the hook text for ffmpeg to overlay.
+    
+    The PNG is only as big as the text, so ffmpeg blends just that box instead
+    of a full 1080x1920 frame. It is the cached render itself, so nothing is
+    written per video unless the cache folder isn't writable.
+    
+    Returns:
+        tuple: (PNG path, (x, y) even overlay position, whether the PNG is a temp file)
+    """
+    tiktok_margins = UGC_CONFIG.get("tiktok_margins", {})
+    use_tiktok_margins = tiktok_margins.get("enabled", False)
+    
+    # Calculate text width with appropriate margins
+    if use_tiktok_margins:
+        horizontal_margin = tiktok_margins.get("horizontal_text_margin", 240)
+    else:
+        horizontal_margin = 120  # Default margin
+    text_width = TARGET_RESOLUTION[0] - horizontal_margin
+    
+    text_image = render_hook_text(hook_text, text_width)
+    
+    if use_tiktok_margins:
+        # Position text 1/3 into the safe area, same as the moviepy path
+        x, y = get_safe_area_text_position(text_image.size, tiktok_margins, TARGET_RESOLUTION, position_factor=0.33)
+    else:
+        x, y = (TARGET_RESOLUTION[0] - text_image.width) / 2, 350
+    
+    # Snap to even coordinates so chroma lines up in yuv420p
+    position = (int(x) // 2 * 2, int(y) // 2 * 2)
+    
+    cache_path = get_text_cache_path(hook_text, text_width)
+    if os.path.exists(cache_path):
+        return cache_path, position, False
+    
+    overlay_path = tempfile.NamedTemporaryFile(suffix='.png', delete=False).name
+    text_image.save(overlay_path)
+    return overlay_path, position, True
+
+def get_encoder_args(codec, gpu_id=0):
+    """Get ffmpeg output arguments for the given video encoder."""
+    settings = get_encoder_settings(codec, gpu_id)
+    args = ['-c:v', settings['codec'], '-preset', settings['preset']]
+    args += settings.get('ffmpeg_params', ['-pix_fmt', 'yuv420p'])
+    return args
+
+def get_decoder_args(info, codec, gpu_id=0, keep_on_gpu=False):
+    """
+    Get ffmpeg input options to decode a clip with NVDEC when encoding with NVENC.
+    
+    The cuvid decoders crop and resize to the target frame themselves, so the
+    filter graph only sees frames that are already the right size. With
+    keep_on_gpu the cropped frames stay in CUDA memory for the GPU filters.
+    
+    Returns:
+        tuple: (input options, whether frames come out already cropped/resized)
+    """
+    if codec != "h264_nvenc":
+        return [], False
+    
+    cuvid = f"{info['video_codec']}_cuvid"
+    if not info['width'] or info['rotation'] or not ffmpeg_has_decoder(cuvid):
+        # Plain NVDEC decode, scaling stays in the filter graph
+        return ['-hwaccel', 'cuda', '-hwaccel_device', str(gpu_id)], False
+    
+    # Centre-crop the source to the target aspect ratio (top x bottom x left x right)
+    width, height = TARGET_RESOLUTION
+    src_w, src_h = info['width'], info['height']
+    if src_w * height > src_h * width:
+        crop_w = src_h * width // height
+        left = (src_w - crop_w) // 2
+        crop = f"0x0x{left}x{src_w - crop_w - left}"
+    else:
+        crop_h = src_w * height // width
+        top = (src_h - crop_h) // 2
+        crop = f"{top}x{src_h - crop_h - top}x0x0"
+    
+    args = ['-c:v', cuvid, '-gpu', str(gpu_id), '-crop', crop, '-resize', f"{width}x{height}"]
+    if keep_on_gpu:
+        args = ['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda', '-hwaccel_device', str(gpu_id)] + args
+    return args, True
+
+def can_overlay_on_gpu(info, codec):
+    """Check whether the hook text can be composited with overlay_cuda."""
+    if codec != "h264_nvenc" or not info['width'] or info['rotation']:
+        return False
+    return (ffmpeg_has_decoder(f"{info['video_codec']}_cuvid")
+            and ffmpeg_has_filter("overlay_cuda") and ffmpeg_has_filter("scale_cuda"))
+
+def build_ffmpeg_command(hook_video_path, overlay_path, cta_video_paths, music_path, tts_file, output_path, codec, gpu_id=0,
+                         debug_overlay_path=None, overlay_position=(0, 0)):
+    """
+    Build a single ffmpeg command that scales, overlays, concatenates and mixes
+    everything for one video, so no frames pass through Python.
+    
+    overlay_path is laid over the hook at overlay_position. debug_overlay_path
+    is an optional full-frame PNG laid over the whole video (the TikTok safe
+    area visualization).
+    """
+    width, height = TARGET_RESOLUTION
+    text_x, text_y = overlay_position
+    
+    hook_info = get_media_info(hook_video_path)
+    tts_duration = get_media_info(tts_file)['duration'] if tts_file else 0
+    # Loop the hook if the voiceover runs longer than the clip
+    hook_duration = max(hook_info['duration'], tts_duration)
+    cta_infos = [get_media_info(path) for path in cta_video_paths]
+    total_duration = hook_duration + sum(info['duration'] for info in cta_infos)
+    
+    # Inputs: 0 = hook, 1 = text overlay, 2.. = CTAs, then music and TTS
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error']
+    if tts_duration > hook_info['duration']:
+        cmd += ['-stream_loop', '-1']
+    # Composite the text on the GPU when the hook can be decoded straight into CUDA memory
+    gpu_overlay = can_overlay_on_gpu(hook_info, codec)
+    if gpu_overlay:
+        cmd += ['-init_hw_device', f'cuda=gpu:{gpu_id}', '-filter_hw_device', 'gpu']
+    hook_decoder, hook_fitted = get_decoder_args(hook_info, codec, gpu_id, keep_on_gpu=gpu_overlay)
+    cmd += hook_decoder + ['-t', f"{hook_duration:.3f}", '-i', hook_video_path]
+    cmd += ['-i', overlay_path]
+    cta_fitted = []
+    for path, info in zip(cta_video_paths, cta_infos):
+        decoder, fitted = get_decoder_args(info, codec, gpu_id)
+        cmd += decoder + ['-i', path]
+        cta_fitted.append(fitted)
+    music_index = 2 + len(cta_video_paths)
+    cmd += ['-stream_loop', '-1', '-i', music_path]
+    if tts_file:
+        cmd += ['-i', tts_file]
+    if debug_overlay_path:
+        cmd += ['-i', debug_overlay_path]
+        debug_index = music_index + (2 if tts_file else 1)
+    
+    # Video: scale+crop each clip to fill the frame (unless NVDEC already did),
+    # overlay text on the hook, concatenate
+    fit = f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},"
+    normalize = "setsar=1,fps=24,format=yuv420p"
+    if gpu_overlay:
+        # overlay_cuda blends yuva420p onto yuv420p, only the composited frame is downloaded
+        filters = [
+            "[0:v]scale_cuda=format=yuv420p[hookv]",
+            "[1:v]format=yuva420p,hwupload_cuda[textv]",
+            f"[hookv][textv]overlay_cuda=x={text_x}:y={text_y},hwdownload,format=yuv420p,{normalize}[v0]"
+        ]
+    else:
+        filters = [
+            f"[0:v]{'' if hook_fitted else fit}{normalize}[hookv]",
+            f"[hookv][1:v]overlay={text_x}:{text_y}:format=auto,format=yuv420p[v0]"
+        ]
+    for i, fitted in enumerate(cta_fitted):
+        filters.append(f"[{2 + i}:v]{'' if fitted else fit}{normalize}[v{i + 1}]")
+    segments = ''.join(f"[v{i}]" for i in range(len(cta_video_paths) + 1))
+    if debug_overlay_path:
+        filters.append(f"{segments}concat=n={len(cta_video_paths) + 1}:v=1:a=0[vcat]")
+        filters.append(f"[vcat][{debug_index}:v]overlay=0:0:format=auto,format=yuv420p[vout]")
+    else:
+        filters.append(f"{segments}concat=n={len(cta_video_paths) + 1}:v=1:a=0[vout]")
+    
+    filters += get_audio_mix_filters(hook_info, hook_duration, cta_infos, total_duration, tts_file,
+                                     hook_index=0, cta_start_index=2, music_index=music_index)
+    
+    cmd += ['-filter_complex', ';'.join(filters), '-map', '[vout]', '-map', '[aout]']
+    cmd += get_encoder_args(codec, gpu_id)
+    cmd += ['-c:a', 'aac', '-b:a', '192k', '-t', f"{total_duration:.3f}", '-movflags', '+faststart', output_path]
+    return cmd
+
+def get_audio_mix_filters(hook_info, hook_duration, cta_infos, total_duration, tts_file, hook_index, cta_start_index,
+                          music_index):
+    """
+    Get the filter graph chains mixing music, TTS, hook and CTA audio into [aout].
+    
+    The TTS input, if any, is expected right after the music input.
+    """
+    # Same levels as the moviepy mix (music 0.3 x 0.4 under TTS, 0.3 x 0.6 without)
+    filters = []
+    audio_format = "aformat=sample_rates=44100:channel_layouts=stereo"
+    mix = []
+    music_volume = 0.3 * (0.4 if tts_file else 0.6)
+    filters.append(f"[{music_index}:a]{audio_format},atrim=0:{total_duration:.3f},volume={music_volume:.3f}[music]")
+    mix.append("[music]")
+    if tts_file:
+        filters.append(f"[{music_index + 1}:a]{audio_format},atrim=0:{hook_duration:.3f},volume=1.5[tts]")
+        mix.append("[tts]")
+    if hook_info['has_audio']:
+        # Hook audio is ducked under the voiceover
+        hook_volume = 0.3 * 1.5 if tts_file else 1.0
+        filters.append(f"[{hook_index}:a]{audio_format},atrim=0:{hook_duration:.3f},volume={hook_volume:.2f}[hooka]")
+        mix.append("[hooka]")
+    start = hook_duration
+    for i, info in enumerate(cta_infos):
+        if info['has_audio']:
+            delay = int(start * 1000)
+            cta_volume = 0.9 if tts_file else 1.0
+            filters.append(f"[{cta_start_index + i}:a]{audio_format},volume={cta_volume},adelay={delay}|{delay}[cta{i}]")
+            mix.append(f"[cta{i}]")
+        start += info['duration']
+    filters.append(f"{''.join(mix)}amix=inputs={len(mix)}:duration=longest:normalize=0[aout]")
+    return filters
+
+def is_normalized_source(video_path):
+    """Check whether a video is a normalize_source() copy."""
+    return os.path.dirname(os.path.abspath(video_path)) == os.path.abspath(NORMALIZED_FOLDER)
+
+def render_video_stream_copy(hook_video_path, overlay_path, overlay_position, cta_video_paths, music_path, tts_file,
+                             output_path, temp_paths):
+    """
+    Render a video from normalized sources, re-encoding only the hook.
+    
+    The hook gets its text burned in with NORMALIZED_VIDEO_ARGS, then the ffmpeg
+    concat demuxer joins it with the CTAs without re-encoding them. Only the
+    audio is mixed and encoded, so long CTAs cost little more than a file copy.
+    """
+    text_x, text_y = overlay_position
+    hook_info = get_media_info(hook_video_path)
+    tts_duration = get_media_info(tts_file)['duration'] if tts_file else 0
+    hook_duration = max(hook_info['duration'], tts_duration)
+    cta_infos = [get_media_info(path) for path in cta_video_paths]
+    total_duration = hook_duration + sum(info['duration'] for info in cta_infos)
+    loop_hook = ['-stream_loop', '-1'] if tts_duration > hook_info['duration'] else []
+    
+    hook_segment_path = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False).name
+    temp_paths.append(hook_segment_path)
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error']
+    cmd += loop_hook + ['-t', f"{hook_duration:.3f}", '-i', hook_video_path, '-i', overlay_path]
+    cmd += ['-filter_complex', f"[0:v][1:v]overlay={text_x}:{text_y}:format=auto,format=yuv420p[v]", '-map', '[v]']
+    cmd += NORMALIZED_VIDEO_ARGS + ['-an', hook_segment_path]
+    subprocess.run(cmd, check=True, capture_output=True)
+    
+    concat_list_path = tempfile.NamedTemporaryFile(suffix='.txt', delete=False).name
+    temp_paths.append(concat_list_path)
+    with open(concat_list_path, 'w', encoding='utf-8') as f:
+        for path in [hook_segment_path, *cta_video_paths]:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    
+    # Inputs: 0 = concatenated video, 1 = hook (audio), 2.. = CTAs (audio), then music and TTS
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', concat_list_path]
+    cmd += loop_hook + ['-t', f"{hook_duration:.3f}", '-i', hook_video_path]
+    for path in cta_video_paths:
+        cmd += ['-i', path]
+    music_index = 2 + len(cta_video_paths)
+    cmd += ['-stream_loop', '-1', '-i', music_path]
+    if tts_file:
+        cmd += ['-i', tts_file]
+    filters = get_audio_mix_filters(hook_info, hook_duration, cta_infos, total_duration, tts_file,
+                                    hook_index=1, cta_start_index=2, music_index=music_index)
+    cmd += ['-filter_complex', ';'.join(filters), '-map', '0:v', '-map', '[aout]', '-c:v', 'copy']
+    cmd += ['-c:a', 'aac', '-b:a', '192k', '-t', f"{total_duration:.3f}", '-movflags', '+faststart', output_path]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+def create_video_ffmpeg(hook_video_path, hook_text, cta_video_paths, music_path, output_path, gpu_id=0, tts_file=None):
+    """Render a video with a single ffmpeg filter graph instead of moviepy."""
+    temp_paths = []
+    debug_overlay_path = None
+    try:
+        print(f"\nProcessing video with hook: {hook_text}")
+        
+        print("Rendering text overlay...")
+        overlay_path, overlay_position, overlay_is_temp = render_hook_overlay(hook_text)
+        if overlay_is_temp:
+            temp_paths.append(overlay_path)
+        
+        # Add debug visualization if enabled
+        tiktok_margins = UGC_CONFIG.get("tiktok_margins", {})
+        if tiktok_margins.get("enabled", False) and tiktok_margins.get("show_debug_visualization", False):
+            debug_overlay_path = tempfile.NamedTemporaryFile(suffix='.png', delete=False).name
+            temp_paths.append(debug_overlay_path)
+            render_safe_area_image(tiktok_margins, TARGET_RESOLUTION).save(debug_overlay_path)
+            logging.info("Added debug visualization of TikTok safe zones")
+        
+        if (debug_overlay_path is None and is_normalized_source(hook_video_path)
+                and all(is_normalized_source(path) for path in cta_video_paths)):
+            print(f"Writing final video to {output_path} with ffmpeg (CTAs stream-copied)...")
+            render_video_stream_copy(hook_video_path, overlay_path, overlay_position, cta_video_paths, music_path, tts_file,
+                                     output_path, temp_paths)
+            logging.info(f"Created video: {output_path} at resolution {TARGET_RESOLUTION}")
+            print(f"✅ Video created successfully: {output_path}")
+            return
+        
+        codec = get_video_encoder()
+        print(f"Writing final video to {output_path} with ffmpeg ({codec})...")
+        cmd = build_ffmpeg_command(hook_video_path, overlay_path, cta_video_paths, music_path, tts_file, output_path, codec, gpu_id,
+                                   debug_overlay_path, overlay_position)
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            if codec == "libx264":
+                raise
+            # Hardware encoder missing or out of sessions, retry on the CPU
+            logging.warning(f"{codec} render failed ({e.stderr.decode(errors='ignore').strip()}), retrying with libx264")
+            cmd = build_ffmpeg_command(hook_video_path, overlay_path, cta_video_paths, music_path, tts_file, output_path, "libx264",
+                                       debug_overlay_path=debug_overlay_path, overlay_position=overlay_position)
+            subprocess.run(cmd, check=True, capture_output=True)
         
         logging.info(f"Created video: {output_path} at resolution {TARGET_RESOLUTION}")
         print(f"✅ Video created successfully: {output_path}")
         
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error creating video: ffmpeg failed: {e.stderr.decode(errors='ignore').strip()}")
+        print(f"❌ Error creating video: {e}")
+        raise
     except Exception as e:
         logging.error(f"Error creating video: {e}")
         print(f"❌ Error creating video: {e}")
         raise
+    finally:
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.unlink(path)
+        if tts_file and os.path.exists(tts_file) and not SAVE_TTS_FILES:
+            os.unlink(tts_file)
+
+def parse_video_number(line):
+    """Get the video number from a video_list.txt line, or None if it has none."""
+    # Get the last column (final_video name)
+    final_video = line.rpartition(',')[2]
+    
+    # Try to match new format first, it works for both camelCase and snake_case hooks
+    match = VIDEO_NUMBER_RE.search(final_video) or OLD_VIDEO_NUMBER_RE.search(final_video)
+    return int(match.group(1)) if match else None
 
-def get_last_video_number():
-    """Get the last video number from video_list.txt"""
+def get_last_video_number(tail_bytes=64 * 1024):
+    """
+    Get the last video number from video_list.txt.
+    
+    Videos are numbered upwards, so only the end of the file is read; the whole
+    file is only scanned if its tail has no numbered entries.
+    """
     if not os.path.exists(VIDEO_LIST_FILE):
         return 0
         
     try:
-        with open(VIDEO_LIST_FILE, 'r') as f:
-            # Skip header
-            next(f, None)
-            # Read all lines
-            lines = [line.strip() for line in f if line.strip()]
+        with open(VIDEO_LIST_FILE, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - tail_bytes))
+            tail = f.read().decode('utf-8', errors='ignore').splitlines()
+            if size > tail_bytes:
+                # First line is probably cut off
+                tail = tail[1:]
+            numbers = [n for n in map(parse_video_number, tail) if n is not None]
             
-            if not lines:
-                return 0
-            
-            numbers = []
-            for line in lines:
-                try:
-                    # Get the last column (final_video name)
-                    final_video = line.split(',')[-1].strip('"')
-                    
-                    # Try to match new format first (YYYYMMDD_PROJECT_NAME_NUM_...)
-                    import re
-                    # This pattern matches a 3-digit number after a date and project name
-                    # It works for both camelCase and snake_case hooks
-                    match = re.search(r'_(\d{3})_h\d+_', final_video)
-                    if match:
-                        num = int(match.group(1))
-                        numbers.append(num)
-                        continue
-                        
-                    # Try old format (final_video_N.mp4)
-                    if "final_video_" in final_video:
-                        num = int(final_video.replace('final_video_', '').replace('.mp4', ''))
-                        numbers.append(num)
-                except (IndexError, ValueError) as e:
-                    logging.error(f"Error parsing line '{line}': {e}")
-                    continue
+            if not numbers and size > tail_bytes:
+                f.seek(0)
+                lines = f.read().decode('utf-8', errors='ignore').splitlines()
+                numbers = [n for n in map(parse_video_number, lines) if n is not None]
             
             last_num = max(numbers) if numbers else 0
             logging.info(f"Found last video number: {last_num}")
@@ -1035,80 +1530,271 @@ def get_last_video_number():
         logging.error(f"Error reading video list file: {e}")
         return 0
 
-def create_descriptive_filename(hook_id, hook_text, hook_video_path, cta_video_paths, video_number):
-    """Create a descriptive filename that includes elements from the hook text and videos used."""
-    # Get base names without extensions
-    hook_video_name = os.path.splitext(os.path.basename(hook_video_path))[0]
+def create_descriptive_filename(hook_id, hook_text, hook_video_stem, cta_count, video_number):
+    """
+    Create a descriptive filename that includes elements from the hook text and videos used.
     
+    hook_video_stem is the hook video's file name without folder or extension.
+    """
     # Process hook text: keep first few words, convert to camelCase
-    import re
-    from datetime import datetime
-    
     # Clean up special characters first
-    cleaned_text = re.sub(r'[^\w\s-]', '', hook_text)
+    cleaned_text = FILENAME_SPECIAL_CHARS_RE.sub('', hook_text)
     
-    # Split into words and limit to first few
-    words = cleaned_text.split()
-    selected_words = words[:3] if len(words) > 3 else words
+    # First three words only, without splitting the rest of the text
+    selected_words = cleaned_text.split(None, 3)[:3]
     
-    # Convert to camelCase
+    # Convert to camelCase: first word lowercase, the rest capitalized, joined without spaces
     if selected_words:
-        # First word lowercase
-        selected_words[0] = selected_words[0].lower()
-        # Rest with first letter capitalized
-        for i in range(1, len(selected_words)):
-            selected_words[i] = selected_words[i].capitalize() if selected_words[i] else ''
-        
-        # Join without spaces
-        hook_summary = ''.join(selected_words)
+        hook_summary = selected_words[0].lower() + ''.join(word.capitalize() for word in selected_words[1:])
     else:
         hook_summary = 'emptyHook'
     
     # Clean up hook video name
-    hook_video_name = re.sub(r'\s+', '_', hook_video_name)  # Replace spaces with underscores
-    
-    # Add CTA reference
-    cta_count = len(cta_video_paths)
+    hook_video_name = WHITESPACE_RE.sub('_', hook_video_stem)  # Replace spaces with underscores
     
     # Add date in format YYYYMMDD
-    today = datetime.now().strftime("%Y%m%d")
+    today = RUN_DATE
     
     # Combine components - format: YYYYMMDD_PROJECT_NAME_NUM_hID_hooksummary_hookvideo_NUMcta.mp4
-    filename = f"{today}_{PROJECT_NAME}_{video_number:03d}_h{hook_id}_{hook_summary}_{hook_video_name}_{cta_count}cta.mp4"
+    prefix = f"{today}_{PROJECT_NAME}_{video_number:03d}_h{hook_id}_"
+    suffix = f"_{hook_video_name}_{cta_count}cta.mp4"
     
     # Ensure the filename isn't too long
-    if len(filename) > 100:
+    if len(prefix) + len(hook_summary) + len(suffix) > 100:
         # If we need to truncate, keep the camelCase format 
         # but truncate to 30 characters
         hook_summary = hook_summary[:30]
-        filename = f"{today}_{PROJECT_NAME}_{video_number:03d}_h{hook_id}_{hook_summary}_{hook_video_name}_{cta_count}cta.mp4"
     
-    return filename
+    return prefix + hook_summary + suffix
+
+def open_video_list():
+    """Open the video list for appending, writing the header if the file is new."""
+    video_list_file = open(VIDEO_LIST_FILE, 'a', newline='', buffering=1 << 16)
+    writer = csv.writer(video_list_file, lineterminator='\n')
+    if video_list_file.tell() == 0:
+        writer.writerow(["hook_video", "hook_text", "cta_videos", "music_file", "final_video"])
+    return video_list_file, writer
 
-def save_video_details(hook_video, hook_text, cta_videos, music_file, final_video):
-    """Save video details to tracking file"""
+def save_video_details(video_list, hook_video, hook_text, cta_videos, music_file, final_video):
+    """Save video details to the open video list (a csv writer)"""
     try:
-        # Create file with header if it doesn't exist
-        if not os.path.exists(VIDEO_LIST_FILE):
-            with open(VIDEO_LIST_FILE, 'w') as f:
-                f.write("hook_video,hook_text,cta_videos,music_file,final_video\n")
-        
         # Format CTA videos as a semicolon-separated list
         cta_videos_str = ';'.join([os.path.basename(v) for v in cta_videos])
         
-        # Append video details
-        with open(VIDEO_LIST_FILE, 'a') as f:
-            # Escape any commas in hook_text and cta_videos_str 
-            safe_hook_text = f'"{hook_text}"' if ',' in hook_text else hook_text
-            safe_cta_videos = f'"{cta_videos_str}"' if ',' in cta_videos_str else cta_videos_str
-            
-            line = f"{os.path.basename(hook_video)},{safe_hook_text},{safe_cta_videos},{os.path.basename(music_file)},{final_video}\n"
-            f.write(line)
-            logging.info(f"Saved video details: {line.strip()}")
+        # csv quotes hook text containing commas or quotes
+        row = [os.path.basename(hook_video), hook_text, cta_videos_str, os.path.basename(music_file), final_video]
+        video_list.writerow(row)
+        logging.info(f"Saved video details: {','.join(row)}")
             
     except Exception as e:
         logging.error(f"Error saving video details: {e}")
 
+def plan_video(hook_video, hook_id, hook_text, video_number, tts_text=None):
+    """Pick the CTA videos and music for one video and work out its output path."""
+    # Get multiple CTA videos respecting limits
+    cta_videos = get_multiple_cta_videos(CTA_VIDEOS_FOLDER, MAX_CTA_VIDEOS, MAX_CTA_DURATION)
+    music_file = get_music(MUSIC_FOLDER)
+    
+    # Create descriptive filename
+    hook_video_stem = os.path.splitext(os.path.basename(hook_video))[0]
+    filename = create_descriptive_filename(hook_id, hook_text, hook_video_stem, len(cta_videos), video_number)
+    
+    return {
+        "hook_video": hook_video,
+        "hook_id": hook_id,
+        "hook_text": hook_text,
+        "tts_text": tts_text,
+        "cta_videos": cta_videos,
+        "music_file": music_file,
+        "output_path": os.path.join(OUTPUT_FOLDER, filename),
+        "video_number": video_number,
+        # Spread videos round-robin across the configured GPUs
+        "gpu_id": GPU_IDS[video_number % len(GPU_IDS)],
+    }
+
+def normalize_source(video_path):
+    """
+    Scale+crop a source video to the target resolution at 24 fps once and cache
+    it in NORMALIZED_FOLDER, so clips reused across many outputs are only
+    resized once. The cached copy is redone when the source is newer.
+    
+    Returns:
+        str: Path to the normalized copy, or the original path if ffmpeg failed
+    """
+    width, height = TARGET_RESOLUTION
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(video_path).encode('utf-8')).hexdigest()[:8]
+    target = os.path.join(NORMALIZED_FOLDER, f"{name}_{path_hash}_{width}x{height}.mp4")
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(video_path):
+        return target
+    
+    os.makedirs(NORMALIZED_FOLDER, exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp.mp4"
+    cmd = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', video_path,
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1,fps=24",
+        *NORMALIZED_VIDEO_ARGS, '-c:a', 'aac', '-b:a', '192k', '-ar', '44100', '-ac', '2',
+        '-movflags', '+faststart', tmp_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        os.replace(tmp_path, target)
+        logging.info(f"Normalized {video_path} to {target}")
+        return target
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logging.warning(f"Could not normalize {video_path}, using the original: {e}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return video_path
+
+def normalize_job_sources(jobs):
+    """Normalize every hook/CTA video used by the planned jobs, each source once."""
+    sources = sorted({job["hook_video"] for job in jobs} | {cta for job in jobs for cta in job["cta_videos"]})
+    print(f"📐 Normalizing {len(sources)} source videos to {TARGET_RESOLUTION[0]}x{TARGET_RESOLUTION[1]}...")
+    with ThreadPoolExecutor(max_workers=get_worker_count()) as executor:
+        normalized = dict(zip(sources, executor.map(normalize_source, sources)))
+    
+    # Keep the original paths for filenames and video_list.txt
+    for job in jobs:
+        job["hook_source"] = normalized[job["hook_video"]]
+        job["cta_sources"] = [normalized[cta] for cta in job["cta_videos"]]
+
+def get_job_tts_file(job):
+    """Get the TTS file path a planned video's voiceover is saved as (None with TTS disabled)."""
+    if not USE_ELEVENLABS:
+        return None
+    hook_duration = get_media_info(job.get("hook_source", job["hook_video"]))['duration']
+    return get_tts_file_path(job["tts_text"] or job["hook_text"], hook_duration)
+
+def submit_tts_requests(jobs, tts_executor):
+    """
+    Request the voiceovers for all planned videos, one request per distinct TTS file.
+    
+    Returns:
+        dict: Future of each request -> list of the jobs waiting on it
+    """
+    requests_by_file = {}
+    tts_futures = {}
+    for job in jobs:
+        try:
+            tts_file = get_job_tts_file(job)
+        except Exception:
+            # Unprobeable hook video: give it its own request, which reports the error
+            tts_file = ("job", job["video_number"])
+        if tts_file not in requests_by_file:
+            requests_by_file[tts_file] = tts_executor.submit(
+                generate_hook_tts, job["hook_text"], job.get("hook_source", job["hook_video"]), job["tts_text"]
+            )
+        tts_futures.setdefault(requests_by_file[tts_file], []).append(job)
+    return tts_futures
+
+def finished_tts_jobs(tts_futures, on_error):
+    """Yield jobs with their tts_file set as their voiceovers finish."""
+    for future in as_completed(tts_futures):
+        for job in tts_futures[future]:
+            try:
+                job["tts_file"] = future.result()
+            except Exception as e:
+                on_error(job, e)
+                continue
+            yield job
+
+def render_video_job(job):
+    """Render one planned video (runs in a worker process)."""
+    create_video(job.get("hook_source", job["hook_video"]), job["hook_text"], job.get("cta_sources", job["cta_videos"]),
+                 job["music_file"], job["output_path"], job["gpu_id"], tts_file=job["tts_file"], generate_tts=False)
+    return job
+
+def get_worker_count():
+    """Get the number of videos to render in parallel."""
+    if MAX_WORKERS > 0:
+        return MAX_WORKERS
+    if get_video_encoder() == "h264_nvenc":
+        # Consumer GPUs only allow a few concurrent NVENC sessions each
+        return 3 * len(GPU_IDS)
+    return max(1, (os.cpu_count() or 2) // 2)
+
+def init_render_worker(worker_counter, workers):
+    """
+    Set up a render worker process: lower its priority and pin it (and the
+    ffmpeg processes it starts, which inherit both) to its own slice of cores.
+    """
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+    
+    if WORKER_NICE and hasattr(os, "nice"):
+        try:
+            os.nice(WORKER_NICE)
+        except OSError as e:
+            logging.warning(f"Could not lower worker priority: {e}")
+    
+    # sched_setaffinity is Linux-only
+    if PIN_WORKER_CPUS and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        per_worker = len(cores) // workers
+        if per_worker >= 1:
+            worker_cores = cores[(worker_id % workers) * per_worker:(worker_id % workers + 1) * per_worker]
+            try:
+                os.sched_setaffinity(0, worker_cores)
+            except OSError as e:
+                logging.warning(f"Could not pin worker {worker_id} to cores {worker_cores}: {e}")
+
+def render_videos(jobs, on_done):
+    """
+    Render planned videos, in parallel when more than one worker is configured.
+    
+    Voiceovers for all videos are requested from ElevenLabs concurrently up
+    front, and each video starts rendering as soon as its voiceover is ready.
+    """
+    workers = min(get_worker_count(), len(jobs))
+    
+    def report_error(job, e):
+        logging.error(f"Error during video creation for video {job['video_number']}: {e}")
+        print(f"\n❌ Error creating video {job['video_number']}: {e}")
+    
+    with ThreadPoolExecutor(max_workers=TTS_WORKERS) as tts_executor:
+        # Videos sharing a hook text and hook video share one voiceover request,
+        # so duplicates don't race on the same file (or get billed twice)
+        tts_futures = submit_tts_requests(jobs, tts_executor)
+        
+        if workers <= 1:
+            with tqdm(total=len(jobs), desc="Generating videos", mininterval=1.0) as progress:
+                def report_tts_error(job, e):
+                    report_error(job, e)
+                    progress.update()
+                
+                for job in finished_tts_jobs(tts_futures, report_tts_error):
+                    try:
+                        on_done(render_video_job(job))
+                    except Exception as e:
+                        report_error(job, e)
+                    progress.update()
+            return
+        
+        print(f"⚙️  Rendering with {workers} parallel workers")
+        # Spawn (not fork) workers: the TTS threads are running while the pool starts
+        context = multiprocessing.get_context("spawn")
+        worker_counter = context.Value('i', 0)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_render_worker,
+                                 initargs=(worker_counter, workers)) as executor, \
+                tqdm(total=len(jobs), desc="Generating videos", mininterval=1.0) as progress:
+            def report_tts_error(job, e):
+                report_error(job, e)
+                progress.update()
+            
+            futures = {}
+            for job in finished_tts_jobs(tts_futures, report_tts_error):
+                futures[executor.submit(render_video_job, job)] = job
+            
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    on_done(future.result())
+                except Exception as e:
+                    report_error(job, e)
+                progress.update()
+
 def main():
     """
     Main script to automate video creation.
@@ -1147,6 +1833,8 @@ def main():
         # Load hooks
         hooks = load_hooks(HOOKS_CSV)
         print(f"📝 Loaded {len(hooks)} hooks from {HOOKS_CSV}")
+        # Resolve TTS texts once here, workers only get the text for their own hook
+        tts_texts = get_tts_texts(hooks)
 
         # Check if hook videos directory exists
         if not os.path.exists(HOOK_VIDEOS_FOLDER):
@@ -1164,56 +1852,30 @@ def main():
             used_hooks = load_used_hooks(USED_HOOKS_FILE)
             print(f"🔄 Found {len(used_hooks)} previously used hooks")
 
-            # Check if we have enough unused hooks
-            if len(used_hooks) >= len(hooks):
+            # Build the unused hook pool once; counting used_hooks against the CSV
+            # would be off when it still lists hooks that were since removed
+            hook_pool = get_unused_hook_pool(hooks, used_hooks)
+            if not hook_pool:
                 print("\n⚠️  No more fresh hooks available! All hooks have been used.")
                 logging.info("Process stopped: All hooks have been used")
                 return
 
-        # Generate videos
+        # Pick assets for every video up front in this process (hook selection and
+        # sequential tracking must not race), then render them in parallel
+        jobs = []
         if GENERATE_ALL_COMBINATIONS:
-            # Create all possible combinations
-            combinations = []
-            for hook_data in hooks.itertuples():
-                hook_text = hook_data.text
-                hook_id = hook_data.id
-                hook_tts = hook_data.tts if hasattr(hook_data, 'tts') else hook_text  # Get TTS text if available
-                for hook_video in hook_videos:
-                    combinations.append((hook_video, hook_id, hook_text))
-            
-            if NUM_VIDEOS > 0 and len(combinations) > NUM_VIDEOS:
+            # Create all possible combinations, only as many as will be rendered
+            combinations = ((hook_video, hook["id"], hook["text"]) for hook in hooks for hook_video in hook_videos)
+            num_combinations = len(hooks) * len(hook_videos)
+            if NUM_VIDEOS > 0 and num_combinations > NUM_VIDEOS:
                 # Limit to NUM_VIDEOS if specified
-                combinations = combinations[:NUM_VIDEOS]
+                combinations = itertools.islice(combinations, NUM_VIDEOS)
+                num_combinations = NUM_VIDEOS
                 
-            print(f"\n🎥 Generating {len(combinations)} videos (all combinations)...")
+            print(f"\n🎥 Generating {num_combinations} videos (all combinations)...")
             
-            for i, (hook_video, hook_id, hook_text) in enumerate(tqdm(combinations, desc="Generating videos")):
-                try:
-                    # Get multiple CTA videos respecting limits
-                    cta_videos = get_multiple_cta_videos(CTA_VIDEOS_FOLDER, MAX_CTA_VIDEOS, MAX_CTA_DURATION)
-                    music_file = get_music(MUSIC_FOLDER)
-
-                    video_number = last_number + i + 1
-                    
-                    # Create descriptive filename
-                    filename = create_descriptive_filename(hook_id, hook_text, hook_video, cta_videos, video_number)
-                    output_path = os.path.join(OUTPUT_FOLDER, filename)
-
-                    create_video(hook_video, hook_text, cta_videos, music_file, output_path)
-
-                    # Save video details
-                    save_video_details(
-                        hook_video,
-                        hook_text,
-                        cta_videos,
-                        music_file,
-                        os.path.basename(output_path)
-                    )
-                    
-                except Exception as e:
-                    logging.error(f"Error during video creation for video {i+1}: {e}")
-                    print(f"\n❌ Error creating video {i+1}: {e}")
-                    continue
+            for hook_video, hook_id, hook_text in combinations:
+                jobs.append(plan_video(hook_video, hook_id, hook_text, last_number + len(jobs) + 1, tts_texts.get(hook_text)))
                     
         else:
             # Check for specific hook IDs
@@ -1221,94 +1883,74 @@ def main():
             if specific_hook_ids:
                 print(f"\n🎥 Generating videos for specific hook IDs: {specific_hook_ids}")
                 # Filter hooks to only include specified IDs
-                hooks = hooks[hooks["id"].isin(specific_hook_ids)]
-                if hooks.empty:
+                # CSV ids are strings, config ids may be numbers
+                specific_hook_ids = {str(hook_id) for hook_id in specific_hook_ids}
+                hooks = [hook for hook in hooks if hook["id"] in specific_hook_ids]
+                if not hooks:
                     print("\n⚠️  No hooks found with the specified IDs!")
                     logging.error("No hooks found with the specified IDs")
                     return
                 print(f"Found {len(hooks)} hooks with specified IDs")
                 
-                # Generate videos for each specified hook
-                for i, hook_data in enumerate(tqdm(hooks.itertuples(), desc="Generating videos")):
-                    try:
-                        hook_video = get_hook_video(HOOK_VIDEOS_FOLDER)
-                        hook_text = hook_data.text
-                        hook_id = hook_data.id
-                        
-                        cta_videos = get_multiple_cta_videos(CTA_VIDEOS_FOLDER, MAX_CTA_VIDEOS, MAX_CTA_DURATION)
-                        music_file = get_music(MUSIC_FOLDER)
-
-                        video_number = last_number + i + 1
-                        
-                        # Create descriptive filename
-                        filename = create_descriptive_filename(hook_id, hook_text, hook_video, cta_videos, video_number)
-                        output_path = os.path.join(OUTPUT_FOLDER, filename)
-
-                        create_video(hook_video, hook_text, cta_videos, music_file, output_path)
-
-                        # Save video details
-                        save_video_details(
-                            hook_video,
-                            hook_text,
-                            cta_videos,
-                            music_file,
-                            os.path.basename(output_path)
-                        )
-
-                        save_used_hook(USED_HOOKS_FILE, hook_text)
-                        used_hooks.add(hook_text)
-                        
-                    except Exception as e:
-                        logging.error(f"Error during video creation for hook ID {hook_id}: {e}")
-                        print(f"\n❌ Error creating video for hook ID {hook_id}: {e}")
-                        continue
+                for hook in hooks:
+                    hook_video = get_hook_video(HOOK_VIDEOS_FOLDER)
+                    jobs.append(plan_video(hook_video, hook["id"], hook["text"], last_number + len(jobs) + 1,
+                                           tts_texts.get(hook["text"])))
             else:
+                # Popping from the shuffled pool reserves each hook so no other video in this run picks it
+                num_videos = min(NUM_VIDEOS, len(hook_pool))
+                if num_videos < NUM_VIDEOS:
+                    print(f"\n⚠️  Only {num_videos} fresh hooks left, generating {num_videos} of {NUM_VIDEOS} videos")
+                    logging.info(f"Only {num_videos} unused hooks available for {NUM_VIDEOS} requested videos")
+                
                 # Generate random combinations
-                print(f"\n🎥 Generating {NUM_VIDEOS} videos...")
-                for i in tqdm(range(NUM_VIDEOS), desc="Generating videos"):
-                    try:
-                        hook_video = get_hook_video(HOOK_VIDEOS_FOLDER)
-                        # Get unused hook with ID
-                        unused_hooks = hooks[~hooks["text"].isin(used_hooks)]
-                        if unused_hooks.empty:
-                            raise ValueError("No unused hooks available.")
-                        selected_hook = unused_hooks.sample(1).iloc[0]
-                        hook_text = selected_hook["text"]
-                        hook_id = selected_hook["id"]
-                        
-                        cta_videos = get_multiple_cta_videos(CTA_VIDEOS_FOLDER, MAX_CTA_VIDEOS, MAX_CTA_DURATION)
-                        music_file = get_music(MUSIC_FOLDER)
-
-                        video_number = last_number + i + 1
-                        
-                        # Create descriptive filename
-                        filename = create_descriptive_filename(hook_id, hook_text, hook_video, cta_videos, video_number)
-                        output_path = os.path.join(OUTPUT_FOLDER, filename)
-
-                        create_video(hook_video, hook_text, cta_videos, music_file, output_path)
-
-                        # Save video details
-                        save_video_details(
-                            hook_video,
-                            hook_text,
-                            cta_videos,
-                            music_file,
-                            os.path.basename(output_path)
-                        )
-
-                        save_used_hook(USED_HOOKS_FILE, hook_text)
-                        used_hooks.add(hook_text)
-                        
-                    except ValueError as e:
-                        if "No unused hooks available" in str(e):
-                            print("\n⚠️  Stopping: No more fresh hooks available!")
-                            logging.info("Process stopped: All hooks have been used")
-                            return
-                        raise
-                    except Exception as e:
-                        logging.error(f"Error during video creation for video {video_number}: {e}")
-                        print(f"\n❌ Error creating video {video_number}: {e}")
-                        continue
+                print(f"\n🎥 Generating {num_videos} videos...")
+                for i in range(num_videos):
+                    hook_id, hook_text = hook_pool.pop()
+                    
+                    hook_video = get_hook_video(HOOK_VIDEOS_FOLDER)
+                    jobs.append(plan_video(hook_video, hook_id, hook_text, last_number + len(jobs) + 1, tts_texts.get(hook_text)))
+        
+        # Keep both tracking files open for the whole run instead of reopening per video
+        video_list_file, video_list = open_video_list()
+        used_hooks_file = None if GENERATE_ALL_COMBINATIONS else open(USED_HOOKS_FILE, 'a', encoding='utf-8', buffering=1 << 16)
+        tracking_files = [f for f in (video_list_file, used_hooks_file) if f]
+        completed = 0
+        
+        def on_video_done(job):
+            nonlocal completed
+            # Save video details
+            save_video_details(
+                video_list,
+                job["hook_video"],
+                job["hook_text"],
+                job["cta_videos"],
+                job["music_file"],
+                os.path.basename(job["output_path"])
+            )
+            if used_hooks_file:
+                save_used_hook(used_hooks_file, job["hook_text"])
+            
+            # Flush in batches so a crash loses at most a few entries
+            completed += 1
+            if completed % TRACKING_FLUSH_EVERY == 0:
+                for f in tracking_files:
+                    f.flush()
+        
+        if NORMALIZE_SOURCES and jobs:
+            normalize_job_sources(jobs)
+        
+        try:
+            render_videos(jobs, on_video_done)
+        finally:
+            # One fsync per file for the whole run
+            for f in tracking_files:
+                try:
+                    f.flush()
+                    os.fsync(f.fileno())
+                except OSError as e:
+                    logging.warning(f"Could not sync {f.name}: {e}")
+                f.close()
 
         end_time = time.time()
         duration = end_time - start_time
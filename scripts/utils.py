@@ -6,8 +6,9 @@ import logging
 import csv
 import json
 import random
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-import numpy as np
+import subprocess
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 def hex_to_rgb(hex_color):
     """Convert hex color to RGB tuple"""
@@ -85,6 +86,39 @@ def load_csv(csv_path):
     logging.info(f"Loaded {len(data)} rows from {csv_path}")
     return data
 
+def load_csv_cached(csv_path, cache_file):
+    """
+    Load a CSV like load_csv, reusing the rows parsed on a previous run.
+    
+    The parsed rows are kept as JSON in cache_file and are used while the CSV's
+    path, size and modification time are unchanged.
+    """
+    if not os.path.exists(csv_path):
+        return load_csv(csv_path)
+    
+    st = os.stat(csv_path)
+    signature = [os.path.abspath(csv_path), st.st_size, st.st_mtime_ns]
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get("signature") == signature:
+                logging.info(f"Loaded {len(cache['rows'])} cached rows for {csv_path}")
+                return cache["rows"]
+        except (json.JSONDecodeError, OSError, KeyError) as e:
+            logging.warning(f"Could not load CSV cache {cache_file}, rebuilding: {e}")
+    
+    rows = load_csv(csv_path)
+    try:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"signature": signature, "rows": rows}, f)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        logging.warning(f"Could not save CSV cache {cache_file}: {e}")
+    return rows
+
 def save_to_csv(data, filepath, fieldnames=None):
     """Save data to a CSV file"""
     if not fieldnames and data:
@@ -97,29 +131,40 @@ def save_to_csv(data, filepath, fieldnames=None):
     
     logging.info(f"Saved {len(data)} rows to {filepath}")
 
+def get_cover_size(clip_w, clip_h, target_w, target_h):
+    """
+    Get the size to scale a clip to so it covers the target, keeping its aspect ratio.
+    
+    Uses integer math only and rounds up to even sides, which yuv420p encoders
+    need, so the result is never smaller than the target.
+    """
+    # target_w/clip_w >= target_h/clip_h without float division
+    if target_w * clip_h >= target_h * clip_w:
+        new_w, new_h = target_w, -(-clip_h * target_w // clip_w)
+    else:
+        new_w, new_h = -(-clip_w * target_h // clip_h), target_h
+    return new_w + (new_w & 1), new_h + (new_h & 1)
+
 def resize_video(clip, target_resolution):
     """Resize video to fill target resolution (may crop to fill)"""
     target_w, target_h = target_resolution
-    clip_w, clip_h = clip.size
     
     # Scale to fill
-    scale = max(target_w/clip_w, target_h/clip_h)
-    new_w = int(clip_w * scale)
-    new_h = int(clip_h * scale)
+    new_w, new_h = get_cover_size(*clip.size, target_w, target_h)
     
     # First scale up
-    clip = clip.resize(width=new_w, height=new_h)
+    clip = clip.resize(newsize=(new_w, new_h))
     
     # Then crop to target size
-    x_center = new_w/2
-    y_center = new_h/2
-    x1 = int(x_center - target_w/2)
-    y1 = int(y_center - target_h/2)
+    x1 = (new_w - target_w) // 2
+    y1 = (new_h - target_h) // 2
     return clip.crop(x1=x1, y1=y1, width=target_w, height=target_h)
 
 def add_text_overlay(clip, text, font_path, font_size, position, color="white", 
                       stroke_color="black", stroke_width=2, config=None):
     """Add text overlay to video clip"""
+    from moviepy.editor import TextClip, CompositeVideoClip
+    
     # Check if we have a config with TikTok margins
     if config and "tiktok_margins" in config:
         tiktok_margins = config.get("tiktok_margins", {})
@@ -176,14 +221,28 @@ def add_text_overlay(clip, text, font_path, font_size, position, color="white",
     
     return CompositeVideoClip([clip, text_clip])
 
+@lru_cache(maxsize=64)
+def list_media_files(directory, extensions):
+    """
+    List the files in a directory ending in one of the given extensions (a tuple), sorted.
+    Cached, since asset folders don't change mid-run; a missing folder lists as empty.
+    """
+    # scandir gets the file type from the directory listing itself, no extra stat per file
+    try:
+        with os.scandir(directory) as entries:
+            return tuple(sorted(
+                entry.name for entry in entries
+                if entry.name.lower().endswith(extensions) and entry.is_file()
+            ))
+    except (FileNotFoundError, NotADirectoryError):
+        return ()
+
 def get_random_file(directory, extensions=None):
     """Get a random file from a directory with specified extensions"""
     if extensions is None:
         extensions = ['.mp4', '.mov', '.mp3', '.wav', '.m4a']
     
-    files = [f for f in os.listdir(directory) 
-             if os.path.isfile(os.path.join(directory, f)) and 
-             any(f.lower().endswith(ext) for ext in extensions)]
+    files = list_media_files(directory, tuple(extensions))
     
     if not files:
         logging.warning(f"No files with extensions {extensions} found in {directory}")
@@ -208,18 +267,13 @@ def get_sequential_file(directory, extensions=None, tracking_file=None, category
     if extensions is None:
         extensions = ['.mp4', '.mov', '.mp3', '.wav', '.m4a']
     
-    # Get list of eligible files
-    files = [f for f in os.listdir(directory) 
-             if os.path.isfile(os.path.join(directory, f)) and 
-             any(f.lower().endswith(ext) for ext in extensions)]
+    # Get list of eligible files, sorted to ensure consistent ordering
+    files = list_media_files(directory, tuple(extensions))
     
     if not files:
         logging.warning(f"No files with extensions {extensions} found in {directory}")
         return None
     
-    # Sort files to ensure consistent ordering
-    files.sort()
-    
     # Initialize or load the tracking data
     tracking_data = {}
     if tracking_file and os.path.exists(tracking_file):
@@ -250,6 +304,195 @@ def get_sequential_file(directory, extensions=None, tracking_file=None, category
     logging.info(f"Sequential selection: {category} file {next_index+1}/{len(files)}: {selected_file}")
     return os.path.join(directory, selected_file)
 
+@lru_cache(maxsize=None)
+def _ffmpeg_components(kind):
+    """List the encoders, decoders or filters the ffmpeg on PATH was built with"""
+    try:
+        output = subprocess.check_output(
+            ['ffmpeg', '-hide_banner', f'-{kind}'], stderr=subprocess.STDOUT
+        ).decode('utf-8', errors='ignore')
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return frozenset()
+    return frozenset(line.split()[1] for line in output.splitlines() if len(line.split()) > 1)
+
+def ffmpeg_has_encoder(encoder):
+    """Check whether the ffmpeg on PATH was built with the given encoder"""
+    return encoder in _ffmpeg_components('encoders')
+
+def ffmpeg_has_decoder(decoder):
+    """Check whether the ffmpeg on PATH was built with the given decoder"""
+    return decoder in _ffmpeg_components('decoders')
+
+def ffmpeg_has_filter(filter_name):
+    """Check whether the ffmpeg on PATH was built with the given filter"""
+    return filter_name in _ffmpeg_components('filters')
+
+@lru_cache(maxsize=256)
+def get_media_info(file_path):
+    """
+    Probe a media file with ffprobe.
+    
+    Returns:
+        dict: duration (seconds), width/height, codec and rotation of the first
+              video stream (None if there is no video), and whether it has audio
+    """
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries',
+        'format=duration:stream=codec_type,codec_name,width,height:stream_tags=rotate:stream_side_data=rotation',
+        '-of', 'json', file_path
+    ]
+    probe = json.loads(subprocess.check_output(cmd).decode('utf-8'))
+    streams = probe.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    
+    # Phone footage stores rotation either as a tag or as display matrix side data
+    rotation = video.get('tags', {}).get('rotate', 0)
+    for side_data in video.get('side_data_list', []):
+        rotation = side_data.get('rotation', rotation)
+    
+    return {
+        'duration': float(probe.get('format', {}).get('duration', 0) or 0),
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'video_codec': video.get('codec_name'),
+        'rotation': int(rotation or 0),
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+def get_media_durations(file_paths, max_workers=8, cache_file=None):
+    """
+    Probe the durations of many media files with ffprobe in parallel.
+    
+    With cache_file, durations are kept in a JSON file keyed on path and only
+    files whose size or modification time changed are probed again.
+    
+    Returns:
+        dict: path -> duration in seconds (0 for files that couldn't be probed)
+    """
+    def probe(file_path):
+        try:
+            return get_media_info(file_path)['duration']
+        except Exception as e:
+            logging.error(f"Error getting duration for {file_path}: {e}")
+            return 0
+    
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                cache = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logging.warning(f"Could not load duration cache {cache_file}, rebuilding: {e}")
+    
+    durations = {}
+    signatures = {}
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+            signatures[file_path] = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            continue
+        entry = cache.get(file_path)
+        if entry and entry[:2] == signatures[file_path]:
+            durations[file_path] = entry[2]
+    
+    to_probe = [p for p in file_paths if p not in durations]
+    if to_probe:
+        # Each probe is a separate ffprobe process, so threads overlap their startup
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            durations.update(zip(to_probe, executor.map(probe, to_probe)))
+        
+        if cache_file:
+            for file_path in to_probe:
+                if file_path in signatures and durations[file_path]:
+                    cache[file_path] = signatures[file_path] + [durations[file_path]]
+            try:
+                os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+                tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, cache_file)
+            except OSError as e:
+                logging.warning(f"Could not save duration cache {cache_file}: {e}")
+    
+    return {file_path: durations[file_path] for file_path in file_paths}
+
+@lru_cache(maxsize=32)
+def load_font(font_path, font_size):
+    """Load a TrueType font once per path and size"""
+    from PIL import ImageFont
+    return ImageFont.truetype(font_path, font_size)
+
+def wrap_text(text, font, max_width):
+    """Split text into lines that fit within max_width pixels when drawn with font"""
+    lines = []
+    for paragraph in text.split('\n'):
+        line = ''
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if not line or font.getlength(candidate) <= max_width:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+def render_text_image(text, font_path, font_size, width, color="white", stroke_color="black",
+                      stroke_width=2, glow_opacity=0.2, glow_radius=0, line_spacing=4):
+    """
+    Render centered, word-wrapped text to a transparent image with PIL.
+    
+    The text is drawn with a stroke, over a wider black "glow" copy at
+    glow_opacity, matching the layered TextClip look. With glow_radius the
+    glow is softened with a Gaussian blur baked into the image.
+    
+    Args:
+        text (str): Text to render
+        font_path (str): Path to a TrueType font
+        font_size (int): Font size in pixels
+        width (int): Width of the text box; text wraps to fit
+        glow_opacity (float): Opacity of the glow layer (0 disables it)
+        glow_radius (int): Gaussian blur radius of the glow in pixels
+    
+    Returns:
+        PIL.Image.Image: RGBA image `width` wide and as tall as the text
+    """
+    from PIL import Image, ImageDraw, ImageFilter
+    
+    font = load_font(font_path, font_size)
+    glow_width = stroke_width + 1
+    # Leave room for the blur to fade out instead of being clipped
+    pad = glow_width + 2 * glow_radius
+    lines = '\n'.join(wrap_text(text, font, width - 2 * pad))
+    
+    # Measure the wrapped block to size the image
+    measure = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    bbox = measure.multiline_textbbox(
+        (width / 2, pad), lines, font=font, anchor='ma', align='center',
+        spacing=line_spacing, stroke_width=glow_width
+    )
+    height = int(bbox[3]) + pad
+    
+    def draw_layer(fill, stroke):
+        layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        ImageDraw.Draw(layer).multiline_text(
+            (width / 2, pad), lines, font=font, fill=fill, anchor='ma', align='center',
+            spacing=line_spacing, stroke_width=stroke, stroke_fill=stroke_color
+        )
+        return layer
+    
+    image = draw_layer(color, stroke_width)
+    if glow_opacity > 0:
+        glow = draw_layer("black", glow_width)
+        if glow_radius:
+            glow = glow.filter(ImageFilter.GaussianBlur(glow_radius))
+        glow.putalpha(glow.getchannel('A').point(lambda a: int(a * glow_opacity)))
+        image = Image.alpha_composite(glow, image)
+    
+    return image
+
 def load_used_items(file_path):
     """Load used items from a file"""
     used_items = []
@@ -277,6 +520,26 @@ def position_text_in_tiktok_safe_area(text_clip, tiktok_margins, target_resoluti
     Returns:
         TextClip: The text clip with position set
     """
+    x_position, y_position = get_safe_area_text_position(
+        text_clip.size, tiktok_margins, target_resolution, position_factor
+    )
+    
+    # Set position with exact coordinates
+    return text_clip.set_position((x_position, y_position))
+
+def get_safe_area_text_position(text_size, tiktok_margins, target_resolution, position_factor=0.33):
+    """
+    Calculate the top-left position for a block of text within TikTok's safe area.
+    
+    Args:
+        text_size (tuple): (width, height) of the rendered text
+        tiktok_margins (dict): Dictionary with top, bottom, left, right margins
+        target_resolution (tuple): (width, height) of the video
+        position_factor (float): Position factor within safe area (0.0=top, 1.0=bottom)
+    
+    Returns:
+        tuple: (x, y) position of the text
+    """
     width, height = target_resolution
     
     # Calculate safe area boundaries
@@ -289,9 +552,8 @@ def position_text_in_tiktok_safe_area(text_clip, tiktok_margins, target_resoluti
     safe_height = safe_bottom - safe_top
     safe_width = safe_right - safe_left
     
-    # Get the height and width of the text clip
-    text_height = text_clip.h
-    text_width = text_clip.w
+    # Get the height and width of the text
+    text_width, text_height = text_size
     
     # Calculate the y position based on the position factor
     # This places the TOP of the text at the specified position factor
@@ -306,9 +568,7 @@ def position_text_in_tiktok_safe_area(text_clip, tiktok_margins, target_resoluti
     x_position = safe_left + (safe_width - text_width) / 2
     
     logging.info(f"Positioning text in safe area at ({x_position}, {y_position})")
-    
-    # Set position with exact coordinates
-    return text_clip.set_position((x_position, y_position))
+    return x_position, y_position
 
 def visualize_safe_area(clip, tiktok_margins, target_resolution, duration=None):
     """
@@ -323,6 +583,7 @@ def visualize_safe_area(clip, tiktok_margins, target_resolution, duration=None):
     Returns:
         CompositeVideoClip: Clip with safe area visualization overlaid
     """
+    import numpy as np
     from moviepy.editor import ColorClip, TextClip, CompositeVideoClip, ImageClip
     
     width, height = target_resolution
@@ -375,6 +636,39 @@ def visualize_safe_area(clip, tiktok_margins, target_resolution, duration=None):
     # Combine clips
     return CompositeVideoClip([clip, safe_clip, top_label, bottom_label])
 
+def render_safe_area_image(tiktok_margins, target_resolution):
+    """
+    Render the TikTok safe area debug lines and labels to a full-frame RGBA image.
+    
+    This is the still-image counterpart of visualize_safe_area, for backends
+    that overlay it with ffmpeg instead of compositing clips in moviepy.
+    
+    Returns:
+        PIL.Image.Image: Transparent image with the safe area drawn in red
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    
+    width, height = target_resolution
+    
+    # Calculate safe area boundaries
+    safe_top = tiktok_margins.get("top", 252)
+    safe_bottom = height - tiktok_margins.get("bottom", 640)
+    safe_left = tiktok_margins.get("left", 120)
+    safe_right = width - tiktok_margins.get("right", 240)
+    
+    image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([safe_left, safe_top, safe_right, safe_bottom], outline=(255, 0, 0, 255), width=1)
+    
+    try:
+        font = ImageFont.truetype("Arial", 20)
+    except OSError:
+        font = ImageFont.load_default()
+    draw.text((safe_left + 10, safe_top - 30), f"Safe Top: {safe_top}px", font=font, fill=(255, 0, 0, 255))
+    draw.text((safe_left + 10, safe_bottom + 5), f"Safe Bottom: {safe_bottom}px", font=font, fill=(255, 0, 0, 255))
+    
+    return image
+
 def apply_iphone_metadata(video_path, temp_path=None):
     """
     Apply iPhone-style metadata to a video file using exiftool.